@@ -2,7 +2,11 @@
 Authentication dependencies and middleware for protecting routes.
 """
 
+import threading
+
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from typing import Optional
@@ -16,6 +20,58 @@ from app.models.user import UserRole
 
 security = HTTPBearer(auto_error=False)
 
+# Role value -> enum member, avoids UserRole(...) construction per request
+_ROLE_ENUM = {role.value: role for role in UserRole}
+_ADMIN_VALUE = UserRole.ADMIN.value
+
+# Short-lived cache of user snapshots so authenticated requests skip the DB lookup
+USER_CACHE_TTL_SECONDS = 30
+_user_cache = TTLCache(maxsize=4096, ttl=USER_CACHE_TTL_SECONDS)
+_user_cache_lock = threading.Lock()
+
+
+def invalidate_user(username: str) -> None:
+    """
+    Drop a user from the authentication cache.
+    
+    Args:
+        username: Username whose cached snapshot should be discarded
+    """
+    with _user_cache_lock:
+        _user_cache.pop(username, None)
+
+
+async def _get_user(username: Optional[str], db: Session) -> Optional[schemas.User]:
+    """
+    Get a user snapshot, hitting the database only on a cache miss.
+    
+    Cache hits stay on the event loop; the lookup on a miss runs in a worker
+    thread so the synchronous query does not block other requests.
+    
+    Args:
+        username: Username from the token's "sub" claim
+        db: Database session
+        
+    Returns:
+        Detached user schema or None if the user does not exist
+    """
+    if username is None:
+        return None
+    
+    with _user_cache_lock:
+        user = _user_cache.get(username)
+    if user is not None:
+        return user
+    
+    row = await run_in_threadpool(AuthService(db).get_user_snapshot, username)
+    if row is None:
+        return None
+    
+    user = schemas.User.model_validate(row)
+    with _user_cache_lock:
+        _user_cache[username] = user
+    return user
+
 
 async def get_current_user_optional(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
@@ -38,9 +94,8 @@ async def get_current_user_optional(
         # Verify token
         token_data = AuthUtils.verify_token(credentials.credentials)
         
-        # Get user from database
-        auth_service = AuthService(db)
-        user = auth_service.get_user_by_username(token_data.get("sub"))
+        # Get user from cache or database
+        user = await _get_user(token_data.get("sub"), db)
         
         if user is None or not user.is_active:
             return None
@@ -77,9 +132,8 @@ async def get_current_user(
     # Verify token
     token_data = AuthUtils.verify_token(credentials.credentials)
     
-    # Get user from database
-    auth_service = AuthService(db)
-    user = auth_service.get_user_by_username(token_data.get("sub"))
+    # Get user from cache or database
+    user = await _get_user(token_data.get("sub"), db)
     
     if user is None:
         raise HTTPException(
@@ -110,7 +164,7 @@ async def get_admin_user(current_user: schemas.User = Depends(get_current_user))
     Raises:
         HTTPException: If user is not an admin
     """
-    if current_user.role != UserRole.ADMIN.value:
+    if not check_admin_permission(current_user):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
@@ -118,25 +172,8 @@ async def get_admin_user(current_user: schemas.User = Depends(get_current_user))
     return current_user
 
 
-async def get_active_user(current_user: schemas.User = Depends(get_current_user)) -> schemas.User:
-    """
-    Dependency to ensure current user is active (for general authenticated routes).
-    
-    Args:
-        current_user: Current authenticated user
-        
-    Returns:
-        Current user if active
-        
-    Raises:
-        HTTPException: If user is not active
-    """
-    if not current_user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User account is deactivated"
-        )
-    return current_user
+# get_current_user already rejects deactivated accounts; kept as an alias for existing imports
+get_active_user = get_current_user
 
 
 def create_permission_dependency(required_role: UserRole):
@@ -149,20 +186,47 @@ def create_permission_dependency(required_role: UserRole):
     Returns:
         Dependency function for the specified role
     """
+    detail_msg = f"Access denied. Required role: {required_role.value}"
+    
     async def permission_dependency(current_user: schemas.User = Depends(get_current_user)) -> schemas.User:
-        if UserRole(current_user.role) != required_role:
+        if _ROLE_ENUM.get(current_user.role) is not required_role:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Access denied. Required role: {required_role.value}"
+                detail=detail_msg
             )
         return current_user
     
     return permission_dependency
 
 
-# Common permission dependencies
-require_admin = create_permission_dependency(UserRole.ADMIN)
-require_viewer = create_permission_dependency(UserRole.VIEWER)
+# Common permission dependencies, specialized for the fixed set of roles
+_VIEWER_VALUE = UserRole.VIEWER.value
+_ADMIN_DENIED_DETAIL = f"Access denied. Required role: {_ADMIN_VALUE}"
+_VIEWER_DENIED_DETAIL = f"Access denied. Required role: {_VIEWER_VALUE}"
+
+
+async def require_admin_dep(current_user: schemas.User = Depends(get_current_user)) -> schemas.User:
+    """Dependency requiring the admin role."""
+    if not check_admin_permission(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=_ADMIN_DENIED_DETAIL
+        )
+    return current_user
+
+
+async def require_viewer_dep(current_user: schemas.User = Depends(get_current_user)) -> schemas.User:
+    """Dependency requiring the viewer role."""
+    if current_user.role != _VIEWER_VALUE:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=_VIEWER_DENIED_DETAIL
+        )
+    return current_user
+
+
+require_admin = require_admin_dep
+require_viewer = require_viewer_dep
 
 
 def check_user_permission(current_user: schemas.User, required_role: UserRole) -> bool:
@@ -176,15 +240,9 @@ def check_user_permission(current_user: schemas.User, required_role: UserRole) -
     Returns:
         True if user has permission, False otherwise
     """
-    try:
-        user_role = UserRole(current_user.role)
-        # Admin has access to everything
-        if user_role == UserRole.ADMIN:
-            return True
-        # Check specific role
-        return user_role == required_role
-    except ValueError:
-        return False
+    user_role = _ROLE_ENUM.get(current_user.role)
+    # Admin has access to everything; unknown roles have access to nothing
+    return user_role is UserRole.ADMIN or user_role is required_role
 
 
 def check_admin_permission(current_user: schemas.User) -> bool:
@@ -197,24 +255,26 @@ def check_admin_permission(current_user: schemas.User) -> bool:
     Returns:
         True if user is admin, False otherwise
     """
-    return check_user_permission(current_user, UserRole.ADMIN)
+    # The cached user snapshot carries the role as its stored string value
+    return current_user.role == _ADMIN_VALUE
 
 
 class AuthMiddleware:
     """Authentication middleware for additional security features."""
     
     @staticmethod
-    def verify_token_not_expired(token: str) -> bool:
+    def verify_token_not_expired(token: str, payload: Optional[dict] = None) -> bool:
         """
         Verify that a token is not expired.
         
         Args:
             token: JWT token string
+            payload: Already verified payload for this token, avoids a second decode
             
         Returns:
             True if token is valid and not expired
         """
-        return not AuthUtils.is_token_expired(token)
+        return not AuthUtils.is_token_expired(token, payload)
     
     @staticmethod
     def extract_user_info_from_token(token: str) -> dict:
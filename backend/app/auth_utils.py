@@ -2,22 +2,148 @@
 Authentication utilities for JWT token management and password hashing.
 """
 
+import base64
+import hashlib
+import json
 import os
-from datetime import datetime, timedelta
+import threading
+import time
+from datetime import timedelta
 from typing import Optional, Union
 
+import orjson
+from cachetools import TTLCache
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 
+from app.config import settings
+
+
+class _OrjsonClaims:
+    """json stand-in for jose.jwt: orjson for claim parsing, stdlib for anything else."""
+    loads = staticmethod(orjson.loads)
+    dumps = staticmethod(json.dumps)
+
+
+# jose.jwt only uses json.loads to parse claims on decode; orjson parses them in C
+jwt.json = _OrjsonClaims
 
 # Password hashing configuration
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Existing hashes below this cost are re-hashed on the next successful login; stronger
+# hashes are kept as they are (bcrypt__rounds would also pin the maximum and downgrade them)
+BCRYPT_ROUNDS = settings.bcrypt_rounds
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__ident="2b",
+)
 
 # JWT configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-here-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))  # 24 hours
+_DECODE_ALGS = (ALGORITHM,)
+_DECODE_KW = {"algorithms": _DECODE_ALGS}
+
+# Password strength character classes
+_SPECIALS = frozenset("!@#$%^&*()_+-=[]{}|;':\",./<>?")
+_HAS_UPPER = 1
+_HAS_LOWER = 2
+_HAS_DIGIT = 4
+_HAS_SPECIAL = 8
+_HAS_ALL = _HAS_UPPER | _HAS_LOWER | _HAS_DIGIT | _HAS_SPECIAL
+
+
+def _build_ascii_class_lut() -> bytes:
+    """256-entry table mapping each byte to its character-class bit (0 for none)."""
+    lut = bytearray(256)
+    for b in range(128):
+        c = chr(b)
+        if c.isupper():
+            lut[b] = _HAS_UPPER
+        elif c.islower():
+            lut[b] = _HAS_LOWER
+        elif c.isdigit():
+            lut[b] = _HAS_DIGIT
+        elif c in _SPECIALS:
+            lut[b] = _HAS_SPECIAL
+    return bytes(lut)
+
+
+_ASCII_CLASS_LUT = _build_ascii_class_lut()
+
+
+def _scan_password(password: str) -> int:
+    """Return a bitmask of the character classes present in a password."""
+    flags = 0
+    
+    # ASCII fast path: bytes.translate does the per-character table lookup in C
+    if password.isascii():
+        for bit in set(password.encode("ascii").translate(_ASCII_CLASS_LUT)):
+            flags |= bit
+        return flags
+    
+    for c in password:
+        if c.isupper():
+            flags |= _HAS_UPPER
+        elif c.islower():
+            flags |= _HAS_LOWER
+        elif c.isdigit():
+            flags |= _HAS_DIGIT
+        elif c in _SPECIALS:
+            flags |= _HAS_SPECIAL
+        if flags == _HAS_ALL:
+            break
+    return flags
+
+
+# Verified token cache, so repeated requests with the same token skip jwt.decode.
+# Entries are small digests and payload dicts; each is further capped by the token's exp.
+TOKEN_CACHE_TTL_SECONDS = 300
+TOKEN_CACHE_MAX_ENTRIES = 10_000
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_MAX_ENTRIES, ttl=TOKEN_CACHE_TTL_SECONDS)
+_token_cache_lock = threading.Lock()
+
+
+def _token_cache_key(token: str) -> bytes:
+    """Fixed-size cache key so large tokens don't inflate cache memory."""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+def _get_cached_payload(token: str) -> Optional[dict]:
+    """Return the cached payload for a token if it is still valid."""
+    key = _token_cache_key(token)
+    with _token_cache_lock:
+        entry = _token_cache.get(key)
+        if entry is None:
+            return None
+        payload, valid_until = entry
+        if valid_until <= time.time():
+            _token_cache.pop(key, None)
+            return None
+    return payload
+
+
+def _cache_payload(token: str, payload: dict) -> None:
+    """Cache a verified payload; the entry never outlives the token's exp claim."""
+    now = time.time()
+    valid_until = now + TOKEN_CACHE_TTL_SECONDS
+    exp = payload.get("exp")
+    if exp is not None:
+        valid_until = min(valid_until, exp)
+    if valid_until <= now:
+        return
+    with _token_cache_lock:
+        _token_cache[_token_cache_key(token)] = (payload, valid_until)
+
+
+def _evict_cached_payload(token: str) -> None:
+    """Drop a token from the verification cache."""
+    with _token_cache_lock:
+        _token_cache.pop(_token_cache_key(token), None)
 
 
 class AuthUtils:
@@ -37,6 +163,20 @@ class AuthUtils:
         """
         return pwd_context.verify(plain_password, hashed_password)
     
+    @staticmethod
+    def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+        """
+        Verify a password and re-hash it if the stored hash uses outdated settings.
+        
+        Args:
+            plain_password: The plain text password
+            hashed_password: The hashed password to verify against
+            
+        Returns:
+            Tuple of (matches, new_hash); new_hash is None unless the hash needs updating
+        """
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    
     @staticmethod
     def get_password_hash(password: str) -> str:
         """
@@ -64,29 +204,35 @@ class AuthUtils:
         """
         to_encode = data.copy()
         
+        # Integer epoch claims avoid datetime construction and conversion inside jose
+        now = int(time.time())
         if expires_delta:
-            expire = datetime.utcnow() + expires_delta
+            expire = now + int(expires_delta.total_seconds())
         else:
-            expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+            expire = now + ACCESS_TOKEN_EXPIRE_MINUTES * 60
         
-        to_encode.update({"exp": expire})
+        to_encode.update({"exp": expire, "iat": now})
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
     
     @staticmethod
-    def verify_token(token: str) -> dict:
+    def verify_token_with_expiry(token: str) -> tuple[dict, Optional[int]]:
         """
-        Verify and decode a JWT token.
+        Verify and decode a JWT token, also returning its expiry.
         
         Args:
             token: JWT token string to verify
             
         Returns:
-            Decoded token payload
+            Tuple of (decoded_payload, exp_timestamp); exp is None if the claim is absent
             
         Raises:
             HTTPException: If token is invalid or expired
         """
+        payload = _get_cached_payload(token)
+        if payload is not None:
+            return payload, payload.get("exp")
+        
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -94,13 +240,32 @@ class AuthUtils:
         )
         
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            payload = jwt.decode(token, SECRET_KEY, **_DECODE_KW)
             username: str = payload.get("sub")
             if username is None:
                 raise credentials_exception
-            return payload
         except JWTError:
+            _evict_cached_payload(token)
             raise credentials_exception
+        
+        _cache_payload(token, payload)
+        return payload, payload.get("exp")
+    
+    @staticmethod
+    def verify_token(token: str) -> dict:
+        """
+        Verify and decode a JWT token.
+        
+        Args:
+            token: JWT token string to verify
+            
+        Returns:
+            Decoded token payload
+            
+        Raises:
+            HTTPException: If token is invalid or expired
+        """
+        return AuthUtils.verify_token_with_expiry(token)[0]
     
     @staticmethod
     def create_token_for_user(user_id: int, username: str, role: str) -> tuple[str, int]:
@@ -118,8 +283,7 @@ class AuthUtils:
         token_data = {
             "sub": username,
             "user_id": user_id,
-            "role": role,
-            "iat": datetime.utcnow()
+            "role": role
         }
         
         token = AuthUtils.create_access_token(token_data)
@@ -143,41 +307,74 @@ class AuthUtils:
         if len(password) < 8:
             errors.append("Password must be at least 8 characters long")
         
-        if not any(c.isupper() for c in password):
+        flags = _scan_password(password)
+        
+        if not flags & _HAS_UPPER:
             errors.append("Password must contain at least one uppercase letter")
         
-        if not any(c.islower() for c in password):
+        if not flags & _HAS_LOWER:
             errors.append("Password must contain at least one lowercase letter")
         
-        if not any(c.isdigit() for c in password):
+        if not flags & _HAS_DIGIT:
             errors.append("Password must contain at least one number")
         
-        if not any(c in "!@#$%^&*()_+-=[]{}|;':\",./<>?" for c in password):
+        if not flags & _HAS_SPECIAL:
             errors.append("Password must contain at least one special character")
         
         return errors
     
     @staticmethod
-    def is_token_expired(token: str) -> bool:
+    def is_token_expired(token: str, payload: Optional[dict] = None) -> bool:
         """
         Check if a JWT token is expired.
         
         Args:
             token: JWT token string
+            payload: Already verified payload for this token, skips decoding when given
             
         Returns:
             True if token is expired, False otherwise
         """
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            exp = payload.get("exp")
-            if exp is None:
+        if payload is None:
+            payload = _get_cached_payload(token)
+        
+        if payload is None:
+            try:
+                payload = jwt.decode(token, SECRET_KEY, **_DECODE_KW)
+            except JWTError:
                 return True
+        
+        exp = payload.get("exp")
+        if exp is None:
+            return True
+        
+        return time.time() > exp
+    
+    @staticmethod
+    def is_token_expired_fast(token: str) -> bool:
+        """
+        Check a JWT token's exp claim without verifying its signature.
+        
+        Only suitable as a cheap liveness pre-check; use verify_token or
+        is_token_expired wherever the token's authenticity matters.
+        
+        Args:
+            token: JWT token string
             
-            expiration_time = datetime.fromtimestamp(exp)
-            return datetime.utcnow() > expiration_time
-        except JWTError:
+        Returns:
+            True if token is expired or malformed, False otherwise
+        """
+        try:
+            _, payload_b64, _ = token.split(".", 2)
+            payload = json.loads(base64.urlsafe_b64decode(payload_b64 + "=" * (-len(payload_b64) % 4)))
+            exp = payload.get("exp")
+        except (ValueError, TypeError, AttributeError):
+            return True
+        
+        if not isinstance(exp, (int, float)):
             return True
+        
+        return time.time() > exp
 
 
 # Convenience functions for backward compatibility
@@ -3,13 +3,24 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 
-# Database URL for SQLite
-SQLALCHEMY_DATABASE_URL = "sqlite:///./urban_project.db"
+from app.config import settings
+
+# Database URL from settings (DATABASE_URL); SQLite by default
+SQLALCHEMY_DATABASE_URL = settings.database_url
+
+# SQLite connections are shared across the request threads
+connect_args = {"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
 
 # Create SQLAlchemy engine
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Needed for SQLite
+    connect_args=connect_args,
+    # Size the pool for concurrent requests and drop stale connections before use
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=True
 )
 
 # Create SessionLocal class
@@ -0,0 +1,148 @@
+"""
+HTTP response caching middleware for read-mostly endpoints.
+Caches GET responses in memory per path policy, with ETag revalidation and stale-if-error fallback.
+"""
+
+import hashlib
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+from cachetools import LRUCache
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+# Freshness policies (seconds) for cached endpoints
+SHORT_MAX_AGE = 5
+NORMAL_MAX_AGE = 30
+LONG_MAX_AGE = 60
+
+# How long an expired entry may still be served if the endpoint fails
+STALE_IF_ERROR_SECONDS = 300
+
+# Headers that are recomputed for every response served from the cache
+_SKIPPED_HEADERS = frozenset({"content-length", "etag", "cache-control"})
+
+
+@dataclass(slots=True)
+class CachedResponse:
+    """A cached response body with its freshness window."""
+    body: bytes
+    headers: Dict[str, str]
+    etag: str
+    max_age: int
+    expires_at: float
+    stale_until: float
+
+
+class HTTPCacheMiddleware(BaseHTTPMiddleware):
+    """
+    Cache successful anonymous GET responses for paths matching a freshness policy.
+    
+    Requests carrying an Authorization header bypass the cache, since responses
+    may depend on the user. A successful write (POST/PUT/PATCH/DELETE) under a
+    cached collection (e.g. PUT /cities/3 for /cities), or under one of the extra
+    invalidating prefixes, clears the cache so changes are visible immediately;
+    writes elsewhere, such as /auth or /feedback, leave it intact. Writes that a
+    request only queues are visible once they finish and cached entries expire.
+    """
+    
+    def __init__(
+        self,
+        app,
+        policies: Iterable[Tuple[str, int]],
+        max_entries: int = 1024,
+        stale_if_error: int = STALE_IF_ERROR_SECONDS,
+        invalidate_prefixes: Iterable[str] = ()
+    ):
+        """
+        Args:
+            app: ASGI application to wrap
+            policies: (path regex, max-age seconds) pairs; first match wins
+            max_entries: Maximum number of cached responses (least recently used are dropped)
+            stale_if_error: Seconds an expired response may be served when the endpoint fails
+            invalidate_prefixes: Paths outside the cached collections whose writes change cached data
+        """
+        super().__init__(app)
+        self.policies: List[Tuple[Pattern[str], int]] = [
+            (re.compile(pattern), max_age) for pattern, max_age in policies
+        ]
+        self.stale_if_error = stale_if_error
+        self.invalidate_prefixes: Tuple[str, ...] = tuple(invalidate_prefixes)
+        self._entries: LRUCache = LRUCache(maxsize=max_entries)
+    
+    def max_age_for(self, path: str) -> Optional[int]:
+        """Return the max-age for a path, or None when it is not cacheable."""
+        for pattern, max_age in self.policies:
+            if pattern.fullmatch(path):
+                return max_age
+        return None
+    
+    def invalidates(self, path: str) -> bool:
+        """Return whether a write to path may change a cached response."""
+        if path.startswith(self.invalidate_prefixes):
+            return True
+        collection = "/" + path.lstrip("/").split("/", 1)[0]
+        return self.max_age_for(collection) is not None
+    
+    def clear(self) -> None:
+        """Drop all cached responses."""
+        self._entries.clear()
+    
+    async def dispatch(self, request: Request, call_next):
+        if request.method != "GET":
+            response = await call_next(request)
+            if (
+                request.method in ("POST", "PUT", "PATCH", "DELETE")
+                and response.status_code < 400
+                and self.invalidates(request.url.path)
+            ):
+                self.clear()
+            return response
+        
+        max_age = self.max_age_for(request.url.path)
+        if max_age is None or "authorization" in request.headers:
+            return await call_next(request)
+        
+        key = (request.url.path, request.url.query)
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and entry.expires_at > now:
+            return self._respond(entry, request, now)
+        
+        try:
+            response = await call_next(request)
+        except Exception:
+            if entry is not None and entry.stale_until > now:
+                return self._respond(entry, request, now)
+            raise
+        
+        if response.status_code >= 500 and entry is not None and entry.stale_until > now:
+            return self._respond(entry, request, now)
+        if response.status_code != 200:
+            return response
+        
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        entry = CachedResponse(
+            body=body,
+            headers={k: v for k, v in response.headers.items() if k not in _SKIPPED_HEADERS},
+            etag=f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"',
+            max_age=max_age,
+            expires_at=now + max_age,
+            stale_until=now + max_age + self.stale_if_error
+        )
+        self._entries[key] = entry
+        return self._respond(entry, request, now)
+    
+    def _respond(self, entry: CachedResponse, request: Request, now: float) -> Response:
+        remaining = max(0, int(entry.expires_at - now))
+        headers = {
+            "ETag": entry.etag,
+            "Cache-Control": f"max-age={remaining}, stale-if-error={self.stale_if_error}"
+        }
+        if request.headers.get("if-none-match") == entry.etag:
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, status_code=200, headers={**entry.headers, **headers})
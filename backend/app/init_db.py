@@ -24,7 +24,7 @@ def create_default_admin():
         auth_service = AuthService(db)
         
         # Check if any admin user exists
-        existing_admin = db.query(User).filter(User.role == UserRole.ADMIN).first()
+        existing_admin = db.query(User).filter(User.role == UserRole.ADMIN.value).first()
         if existing_admin:
             print(f"Admin user already exists: {existing_admin.username}")
             return existing_admin
@@ -3,17 +3,108 @@ Logging configuration for the Urban Green Spaces API.
 Provides structured logging for background tasks, API requests, and system events.
 """
 
+import atexit
+import functools
+import inspect
+import itertools
 import logging
 import logging.handlers
 import os
+import queue
 import sys
-from datetime import datetime
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 
 from app.config import settings
 
 
+LOG_BUFFER_SIZE = 64 * 1024  # bytes buffered per log file before a write() syscall
+LOG_FLUSH_INTERVAL = 2.0  # seconds between periodic flushes of buffered log files
+TASK_EVENT_BUFFER_SIZE = 1024  # started task runs awaiting their end record; oldest dropped beyond this
+
+# Records are handed to a queue on the caller's thread; a single listener thread
+# owns the real handlers, so formatting and file I/O stay off request/task threads
+_log_queue = queue.SimpleQueue()
+_listener: Optional[logging.handlers.QueueListener] = None
+_flusher: Optional["_PeriodicFlusher"] = None
+_setup_lock = threading.Lock()
+_configured = False
+
+
+class BufferedTimedRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """
+    Time-rotating file handler that buffers writes instead of flushing per record.
+    
+    Records below flush_level stay in a large write buffer that is flushed
+    periodically (see _PeriodicFlusher) and on close; ERROR and above are
+    flushed immediately so failures reach disk without delay. The rollover
+    check is a plain timestamp comparison, so nothing on the hot path touches
+    the file position.
+    """
+    
+    def __init__(self, *args, buffer_size: int = LOG_BUFFER_SIZE, flush_level: int = logging.ERROR, **kwargs):
+        self.buffer_size = buffer_size
+        self.flush_level = flush_level
+        super().__init__(*args, **kwargs)
+    
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=self.buffer_size,
+                    encoding=self.encoding, errors=self.errors)
+    
+    def emit(self, record):
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= self.flush_level:
+                self.stream.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+class _PeriodicFlusher(threading.Thread):
+    """Daemon thread flushing buffered handlers on a fixed interval."""
+    
+    def __init__(self, handlers, interval: float = LOG_FLUSH_INTERVAL):
+        super().__init__(name="urban-api-log-flusher", daemon=True)
+        self.handlers = handlers
+        self.interval = interval
+        self._stopped = threading.Event()
+    
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            for handler in self.handlers:
+                handler.flush()
+    
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def _stop_listener():
+    """Drain the log queue and close the handlers owned by the listener."""
+    global _listener, _flusher
+    if _flusher is not None:
+        _flusher.stop()
+        _flusher = None
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+atexit.register(_stop_listener)
+
+
 class ColoredFormatter(logging.Formatter):
     """Custom formatter that adds colors to console output."""
     
@@ -26,47 +117,85 @@ class ColoredFormatter(logging.Formatter):
     }
     RESET = '\033[0m'
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._colored = {level: f"{color}{level}{self.RESET}" for level, color in self.COLORS.items()}
+    
     def format(self, record):
-        if record.levelname in self.COLORS:
-            record.levelname = f"{self.COLORS[record.levelname]}{record.levelname}{self.RESET}"
-        return super().format(record)
+        # Swap the level name only for this format call; the record is shared with other handlers
+        levelname = record.levelname
+        record.levelname = self._colored.get(levelname, levelname)
+        try:
+            return super().format(record)
+        finally:
+            record.levelname = levelname
+
+
+_BG_PREFIX = 'urban_api.tasks.'  # loggers handed out by get_task_logger
 
 
 class BackgroundTaskFilter(logging.Filter):
     """Filter to identify background task related log messages."""
     
     def filter(self, record):
-        # Add background task identifier
-        if hasattr(record, 'task_type'):
-            return True
-        
-        # Check if the message is from background task modules
-        task_modules = ['background_tasks', 'scheduler', 'coverage_update']
-        if any(module in record.name for module in task_modules):
+        # Tag records from task loggers so the background handler can pick them out
+        if getattr(record, 'task_type', None) is None and record.name.startswith(_BG_PREFIX):
             record.task_type = 'background'
-            return True
-        
         return True
 
 
+class BGTaskOnlyFilter(logging.Filter):
+    """Filter passing only records tagged as background task messages."""
+    
+    def filter(self, record):
+        return getattr(record, 'task_type', None) == 'background'
+
+
+class NotBGTaskFilter(logging.Filter):
+    """Filter passing only records not tagged as background task messages."""
+    
+    def filter(self, record):
+        return getattr(record, 'task_type', None) != 'background'
+
+
 def setup_logging(
     log_level: Optional[str] = None,
     log_file: Optional[str] = None,
     enable_console: bool = True,
-    enable_file: bool = True
+    enable_file: bool = True,
+    force: bool = False
 ) -> logging.Logger:
     """
     Set up comprehensive logging configuration.
     
+    Only the first call configures handlers; later calls return the configured
+    logger unchanged unless force is set.
+    
     Args:
         log_level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         log_file: Path to log file
         enable_console: Whether to enable console logging
         enable_file: Whether to enable file logging
+        force: Replace an existing configuration
         
     Returns:
         Configured logger instance
     """
+    with _setup_lock:
+        if _configured and not force:
+            return main_logger
+        return _setup_logging(log_level, log_file, enable_console, enable_file)
+
+
+def _setup_logging(
+    log_level: Optional[str],
+    log_file: Optional[str],
+    enable_console: bool,
+    enable_file: bool
+) -> logging.Logger:
+    """Build handlers and start the queue listener; caller holds _setup_lock."""
+    global _listener, _flusher, _configured
+    
     # Use settings defaults if not provided
     log_level = log_level or settings.log_level
     log_file = log_file or settings.log_file
@@ -75,8 +204,10 @@ def setup_logging(
     logger = logging.getLogger('urban_api')
     logger.setLevel(getattr(logging, log_level.upper()))
     
-    # Clear existing handlers
+    # Clear existing handlers and stop any listener from a previous setup
+    _stop_listener()
     logger.handlers.clear()
+    handlers = []
     
     # Create formatter for detailed logging
     detailed_formatter = logging.Formatter(
@@ -101,27 +232,30 @@ def setup_logging(
             datefmt='%H:%M:%S'
         )
         console_handler.setFormatter(colored_formatter)
-        console_handler.addFilter(BackgroundTaskFilter())
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
     
     # File handler with rotation
     if enable_file:
+        log_path = Path(log_file)
+        bg_log_path = log_path.with_stem(f"{log_path.stem}_background")
         try:
             # Create log directory if it doesn't exist
-            log_path = Path(log_file)
             log_path.parent.mkdir(parents=True, exist_ok=True)
             
-            # Rotating file handler
-            file_handler = logging.handlers.RotatingFileHandler(
+            # Time-rotating file handler
+            file_handler = BufferedTimedRotatingFileHandler(
                 filename=log_file,
-                maxBytes=settings.log_max_size,
+                when=settings.log_rotation_when,
                 backupCount=settings.log_backup_count,
-                encoding='utf-8'
+                encoding='utf-8',
+                utc=True,
+                delay=True
             )
             file_handler.setLevel(getattr(logging, log_level.upper()))
             file_handler.setFormatter(detailed_formatter)
-            file_handler.addFilter(BackgroundTaskFilter())
-            logger.addHandler(file_handler)
+            # Background task records go to their own file only, so each record is formatted once
+            file_handler.addFilter(NotBGTaskFilter())
+            handlers.append(file_handler)
             
         except Exception as e:
             print(f"Warning: Could not create file handler for {log_file}: {e}")
@@ -129,79 +263,108 @@ def setup_logging(
     # Create separate handler for background tasks
     if enable_file:
         try:
-            bg_log_file = log_file.replace('.log', '_background.log')
-            bg_handler = logging.handlers.RotatingFileHandler(
-                filename=bg_log_file,
-                maxBytes=settings.log_max_size,
+            bg_handler = BufferedTimedRotatingFileHandler(
+                filename=bg_log_path,
+                when=settings.log_rotation_when,
                 backupCount=settings.log_backup_count,
-                encoding='utf-8'
+                encoding='utf-8',
+                utc=True,
+                delay=True
             )
             bg_handler.setLevel(logging.DEBUG)
             bg_handler.setFormatter(detailed_formatter)
-            
-            # Create filter for background tasks only
-            class BGTaskOnlyFilter(logging.Filter):
-                def filter(self, record):
-                    return hasattr(record, 'task_type') and record.task_type == 'background'
-            
             bg_handler.addFilter(BGTaskOnlyFilter())
-            logger.addHandler(bg_handler)
+            handlers.append(bg_handler)
             
         except Exception as e:
             print(f"Warning: Could not create background task handler: {e}")
     
+    # The logger only enqueues; the listener thread dispatches to the real handlers.
+    # Records are tagged once here rather than by a filter on every handler.
+    queue_handler = logging.handlers.QueueHandler(_log_queue)
+    queue_handler.addFilter(BackgroundTaskFilter())
+    logger.addHandler(queue_handler)
+    _listener = logging.handlers.QueueListener(_log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    
+    buffered_handlers = [h for h in handlers if isinstance(h, BufferedTimedRotatingFileHandler)]
+    if buffered_handlers:
+        _flusher = _PeriodicFlusher(buffered_handlers)
+        _flusher.start()
+    
+    _configured = True
     return logger
 
 
-def get_task_logger(task_name: str) -> logging.Logger:
+class TaskLoggerAdapter(logging.LoggerAdapter):
+    """Logger adapter prefixing messages with the background task name."""
+    
+    def process(self, msg, kwargs):
+        return f"[{self.extra['task_name']}] {msg}", kwargs
+
+
+_TASK_LOGGER_CACHE: Dict[str, TaskLoggerAdapter] = {}
+
+# Task start events are held here, keyed by run id, and emitted with the matching end record
+_task_events: "OrderedDict[int, tuple]" = OrderedDict()
+_task_events_lock = threading.Lock()
+_task_run_ids = itertools.count(1)
+
+
+def get_task_logger(task_name: str) -> logging.LoggerAdapter:
     """
     Get a logger specifically for background tasks.
     
+    Adapters are built once per task name and reused on later calls.
+    
     Args:
         task_name: Name of the background task
         
     Returns:
         Logger configured for background tasks
     """
-    logger = logging.getLogger(f'urban_api.tasks.{task_name}')
-    
-    # Add task type for filtering
-    class TaskLoggerAdapter(logging.LoggerAdapter):
-        def process(self, msg, kwargs):
-            return f"[{self.extra['task_name']}] {msg}", kwargs
-    
-    adapter = TaskLoggerAdapter(logger, {'task_name': task_name})
-    
-    # Add task type attribute to all records
-    original_handle = adapter.process
-    def process_with_task_type(msg, kwargs):
-        msg, kwargs = original_handle(msg, kwargs)
-        # This is a bit of a hack, but it works with the filter
-        return msg, kwargs
-    
-    adapter.process = process_with_task_type
-    return adapter
+    try:
+        return _TASK_LOGGER_CACHE[task_name]
+    except KeyError:
+        logger = logging.getLogger(f'{_BG_PREFIX}{task_name}')
+        return _TASK_LOGGER_CACHE.setdefault(task_name, TaskLoggerAdapter(logger, {'task_name': task_name}))
 
 
 def log_performance(func):
-    """Decorator to log function performance."""
+    """Decorator to log function performance; coroutine functions are timed until awaited to completion."""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start_ns = time.perf_counter_ns()
+            
+            try:
+                result = await func(*args, **kwargs)
+                if performance_logger.isEnabledFor(logging.INFO):
+                    duration = (time.perf_counter_ns() - start_ns) / 1e9
+                    performance_logger.info("%s completed in %.2fs", func.__name__, duration)
+                return result
+                
+            except Exception as e:
+                duration = (time.perf_counter_ns() - start_ns) / 1e9
+                performance_logger.error("%s failed after %.2fs: %s", func.__name__, duration, e)
+                raise
+        
+        return async_wrapper
+    
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        logger = logging.getLogger('urban_api.performance')
-        start_time = datetime.now()
+        start_ns = time.perf_counter_ns()
         
         try:
             result = func(*args, **kwargs)
-            end_time = datetime.now()
-            duration = (end_time - start_time).total_seconds()
-            
-            logger.info(f"{func.__name__} completed in {duration:.2f}s")
+            if performance_logger.isEnabledFor(logging.INFO):
+                duration = (time.perf_counter_ns() - start_ns) / 1e9
+                performance_logger.info("%s completed in %.2fs", func.__name__, duration)
             return result
             
         except Exception as e:
-            end_time = datetime.now()
-            duration = (end_time - start_time).total_seconds()
-            
-            logger.error(f"{func.__name__} failed after {duration:.2f}s: {e}")
+            duration = (time.perf_counter_ns() - start_ns) / 1e9
+            performance_logger.error("%s failed after %.2fs: %s", func.__name__, duration, e)
             raise
     
     return wrapper
@@ -209,56 +372,114 @@ def log_performance(func):
 
 def log_api_request(request_info: dict):
     """Log API request information."""
-    logger = logging.getLogger('urban_api.requests')
-    logger.info(f"API Request: {request_info}")
+    # Lazy %-formatting: the dict repr is only built if a handler accepts the record
+    request_logger.info("API Request: %s", request_info)
 
 
-def log_background_task_start(task_name: str, details: dict = None):
-    """Log the start of a background task."""
-    logger = get_task_logger(task_name)
-    details_str = f" | Details: {details}" if details else ""
-    logger.info(f"Background task started{details_str}")
+def log_background_task_start(task_name: str, details: dict = None) -> int:
+    """
+    Record the start of a background task run; it is logged together with the run's end.
+    
+    Args:
+        task_name: Name of the task
+        details: Details logged with the end record
+    
+    Returns:
+        Run id to pass to log_background_task_end, so concurrent runs of the
+        same task are each matched with their own start
+    """
+    run_id = next(_task_run_ids)
+    with _task_events_lock:
+        _task_events[run_id] = (task_name, time.perf_counter(), details)
+        if len(_task_events) > TASK_EVENT_BUFFER_SIZE:
+            _task_events.popitem(last=False)
+    return run_id
 
 
-def log_background_task_end(task_name: str, success: bool, details: dict = None):
-    """Log the completion of a background task."""
+def log_background_task_end(task_name: str, run_id: int, success: bool, details: dict = None):
+    """Log the completion of a background task run as one record, including its start details."""
+    with _task_events_lock:
+        start = _task_events.pop(run_id, None)
+    level = logging.INFO if success else logging.ERROR
     logger = get_task_logger(task_name)
+    if not logger.isEnabledFor(level):
+        return
     status = "completed successfully" if success else "failed"
-    details_str = f" | Details: {details}" if details else ""
     
-    if success:
-        logger.info(f"Background task {status}{details_str}")
-    else:
-        logger.error(f"Background task {status}{details_str}")
+    if start is None:
+        logger.log(level, "Background task %s | Details: %s", status, details or {})
+        return
+    
+    _, started_at, start_details = start
+    logger.log(
+        level,
+        "Background task %s in %.2fs | Started with: %s | Details: %s",
+        status, time.perf_counter() - started_at, start_details or {}, details or {}
+    )
+
+
+def flush_task_events():
+    """Log task runs that were started but never ended, e.g. on shutdown."""
+    with _task_events_lock:
+        pending = list(_task_events.values())
+        _task_events.clear()
+    for task_name, started_at, details in pending:
+        get_task_logger(task_name).info(
+            "Background task still running after %.2fs | Started with: %s",
+            time.perf_counter() - started_at, details or {}
+        )
 
 
 def log_satellite_processing(city_name: str, processing_stats: dict):
     """Log satellite data processing information."""
     logger = get_task_logger('satellite_processing')
-    logger.info(f"Processed satellite data for {city_name}: {processing_stats}")
+    logger.info("Processed satellite data for %s: %s", city_name, processing_stats)
+
+
+_CACHE_OPERATION_MESSAGES = {
+    op: sys.intern(f"Cache {op}") for op in ('hit', 'miss', 'set', 'evict', 'expire', 'refresh')
+}
+_CITY_SUFFIX_CACHE_SIZE = 256  # cities are a small fixed set; cap guards against unbounded names
+_city_suffixes: Dict[str, str] = {}
+
+
+def _city_suffix(city_name: str) -> str:
+    """Return the shared ' for <city>' message fragment for a city."""
+    suffix = _city_suffixes.get(city_name)
+    if suffix is None:
+        suffix = f" for {city_name}"
+        if len(_city_suffixes) < _CITY_SUFFIX_CACHE_SIZE:
+            _city_suffixes[sys.intern(city_name)] = suffix
+    return suffix
 
 
 def log_cache_operation(operation: str, city_name: str = None, details: dict = None):
     """Log cache operations."""
-    logger = logging.getLogger('urban_api.cache')
-    city_info = f" for {city_name}" if city_name else ""
-    details_str = f" | {details}" if details else ""
-    logger.debug(f"Cache {operation}{city_info}{details_str}")
+    if not cache_logger.isEnabledFor(logging.DEBUG):
+        return
+    message = _CACHE_OPERATION_MESSAGES.get(operation) or f"Cache {operation}"
+    city_info = _city_suffix(city_name) if city_name else ""
+    if details:
+        cache_logger.debug("%s%s | %s", message, city_info, details)
+    else:
+        cache_logger.debug("%s%s", message, city_info)
 
 
-# Initialize logging when module is imported
-main_logger = setup_logging()
+# Handlers are installed by the first setup_logging() call, not at import time
+main_logger = logging.getLogger('urban_api')
 
 # Create convenience loggers
 api_logger = logging.getLogger('urban_api.api')
 task_logger = logging.getLogger('urban_api.tasks')
 cache_logger = logging.getLogger('urban_api.cache')
 performance_logger = logging.getLogger('urban_api.performance')
+request_logger = logging.getLogger('urban_api.requests')
 
 
 if __name__ == "__main__":
     # Test logging configuration
     print("Testing logging configuration...")
+    setup_logging()
     
     main_logger.debug("Debug message")
     main_logger.info("Info message")
@@ -1,29 +1,84 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Query
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi.responses import ORJSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import exists, func, insert, inspect, select
+from sqlalchemy.orm import Session, load_only
+from typing import List, Optional, Tuple
 import math
+from contextlib import asynccontextmanager
+from bisect import bisect_left, bisect_right
 import asyncio
+import logging
+import anyio
+import numpy as np
+import orjson
+from cachetools import TTLCache
 
 from app.database import get_db
 from app.models import City, Park, GreenCoverage, Feedback
+from app.models.park import parks_rtree
 from app import schemas
 from app.routers import shapefile, auth
-from app.auth_dependencies import get_admin_user, get_current_user_optional
+from app.auth_dependencies import check_admin_permission, get_admin_user, get_current_user_optional
 from app.services.cache_service import CacheService
 from app.services.background_tasks import background_task_service
 from app.services.external_data_service import get_external_data_service, cleanup_external_data_service
 from app.config import settings
-from app.logging_config import setup_logging, api_logger
+from app.logging_config import setup_logging, flush_task_events, api_logger
+from app.http_cache import HTTPCacheMiddleware, SHORT_MAX_AGE, NORMAL_MAX_AGE, LONG_MAX_AGE
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background tasks with the application and stop them when it shuts down."""
+    setup_logging()
+    # Sync endpoints run in AnyIO's worker threads; raise the default 40-thread cap
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.api_thread_limit
+    api_logger.info("Starting Urban Green Spaces API")
+    # The settings dump is only built when debug logging is on
+    if api_logger.isEnabledFor(logging.DEBUG):
+        api_logger.debug("Configuration: %s", settings.to_dict())
+    
+    if settings.enable_background_tasks and settings.scheduler_in_api:
+        await background_task_service.start_scheduler()
+        api_logger.info("Background task scheduler started")
+    elif settings.enable_background_tasks:
+        api_logger.info("Background task scheduler runs in a separate process")
+    else:
+        api_logger.info("Background tasks disabled in configuration")
+    
+    try:
+        yield
+    finally:
+        api_logger.info("Shutting down Urban Green Spaces API")
+        await background_task_service.stop_scheduler()
+        await asyncio.to_thread(shapefile.shutdown_coverage_pool)
+        await cleanup_external_data_service()
+        api_logger.info("External data service cleanup completed")
+        flush_task_events()
 
-# Initialize logging
-logger = setup_logging()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Urban Green Spaces API",
     description="API for managing urban green spaces, parks, and green coverage data with satellite imagery integration and automated weekly updates",
-    version="1.1.0"
+    version="1.1.0",
+    # Serialize responses with orjson; list endpoints spend most of their CPU encoding JSON
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
+
+# Cache read-mostly GET endpoints; registered before CORS so CORS headers are added per request
+app.add_middleware(
+    HTTPCacheMiddleware,
+    policies=[
+        (r"/|/health", SHORT_MAX_AGE),
+        (r"/cities|/parks|/green-coverage|/coverage/trend", NORMAL_MAX_AGE),
+        (r"/cities/\d+|/parks/\d+", LONG_MAX_AGE),
+    ],
+    # These write green coverage (and possibly cities) from outside the cached collections
+    invalidate_prefixes=("/shapefile/calculate-green-coverage", "/background-tasks/trigger-update")
 )
 
 # Add CORS middleware to allow frontend connections
@@ -40,27 +95,57 @@ app.include_router(auth.router)
 app.include_router(shapefile.router)
 
 
-# Background task lifecycle events
-@app.on_event("startup")
-async def startup_event():
-    """Start background tasks when the application starts."""
-    api_logger.info("Starting Urban Green Spaces API")
-    api_logger.info(f"Configuration: {settings.to_dict()}")
+class SimpleCache:
+    """Simple in-memory cache for external data, since we have a different cache system for coverage."""
     
-    if settings.enable_background_tasks:
-        await background_task_service.start_scheduler()
-        api_logger.info("Background task scheduler started")
-    else:
-        api_logger.info("Background tasks disabled in configuration")
+    def __init__(self):
+        self.cache = {}
+    
+    async def get(self, key):
+        return self.cache.get(key)
+    
+    async def set(self, key, value, ttl=None):
+        self.cache[key] = value
 
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Stop background tasks when the application shuts down."""
-    api_logger.info("Shutting down Urban Green Spaces API")
-    await background_task_service.stop_scheduler()
-    await cleanup_external_data_service()
-    api_logger.info("External data service cleanup completed")
+# Shared by every request that talks to the external data service
+_external_data_cache = SimpleCache()
+
+# Identical enhanced-data lookups within this window share one fetch
+ENHANCED_DATA_TTL_SECONDS = 300
+_enhanced_data_memo: TTLCache = TTLCache(maxsize=1024, ttl=ENHANCED_DATA_TTL_SECONDS)
+
+
+def get_enhanced_city_data_memoized(external_service, city: City) -> asyncio.Future:
+    """
+    Fetch enhanced data for a city, reusing a recent or in-flight fetch for the same place.
+    
+    Args:
+        external_service: External data service used on a memo miss
+        city: City to fetch real-time data for
+        
+    Returns:
+        Awaitable resolving to the enhanced city data
+    """
+    latitude, longitude = float(city.latitude), float(city.longitude)
+    key = (city.name.lower(), city.country.lower(), round(latitude, 2), round(longitude, 2))
+    task = _enhanced_data_memo.get(key)
+    if task is None:
+        task = asyncio.ensure_future(
+            external_service.get_enhanced_city_data(city.name, city.country, latitude, longitude)
+        )
+        _enhanced_data_memo[key] = task
+        
+        def forget_failure(done: asyncio.Future):
+            if done.cancelled() or done.exception() is not None:
+                _enhanced_data_memo.pop(key, None)
+        
+        task.add_done_callback(forget_failure)
+    # Shielded so one cancelled request does not cancel the fetch other requests await
+    return asyncio.shield(task)
+
+# Radius of earth in kilometers
+EARTH_RADIUS_KM = 6371
 
 
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -70,19 +155,131 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     
     Returns distance in kilometers.
     """
-    # Convert decimal degrees to radians
-    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+    # Haversine formula; degree differences are converted once instead of per endpoint
+    sin_dlat = math.sin(math.radians(lat2 - lat1) / 2)
+    sin_dlon = math.sin(math.radians(lon2 - lon1) / 2)
+    a = sin_dlat * sin_dlat + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * sin_dlon * sin_dlon
+    c = 2 * math.asin(math.sqrt(min(a, 1.0)))
+    
+    return c * EARTH_RADIUS_KM
+
+
+def haversine_distances(latitude: float, longitude: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Vectorized calculate_distance from one point to arrays of points.
     
-    # Haversine formula
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
+    Args:
+        latitude: Origin latitude in decimal degrees
+        longitude: Origin longitude in decimal degrees
+        lats: Latitudes of the target points in decimal degrees
+        lons: Longitudes of the target points in decimal degrees
+        
+    Returns:
+        Array of distances in kilometers
+    """
+    lat1 = math.radians(latitude)
+    lon1 = math.radians(longitude)
     
-    # Radius of earth in kilometers
-    r = 6371
+    # Same formula as calculate_distance, evaluated in place over three buffers.
+    # Origin terms are scalars computed once per call, not once per park.
+    a = np.radians(lats, dtype=np.float64)
+    lon_term = np.cos(a)
+    lon_term *= math.cos(lat1)
+    a -= lat1
+    a *= 0.5
+    np.sin(a, out=a)
+    a *= a
     
-    return c * r
+    dlon = np.radians(lons, dtype=np.float64)
+    dlon -= lon1
+    dlon *= 0.5
+    np.sin(dlon, out=dlon)
+    dlon *= dlon
+    lon_term *= dlon
+    
+    a += lon_term
+    np.minimum(a, 1.0, out=a)  # rounding can push near-antipodal points past arcsin's domain
+    np.sqrt(a, out=a)
+    np.arcsin(a, out=a)
+    a *= 2 * EARTH_RADIUS_KM
+    return a
+
+
+# Rows fetched per cursor batch when streaming nearest-park candidates
+NEAREST_PARKS_BATCH_SIZE = 1000
+
+# Green coverage columns returned by the list endpoint
+_COVERAGE_RESPONSE_COLUMNS = (
+    GreenCoverage.city_id, GreenCoverage.city_name, GreenCoverage.coverage_percentage,
+    GreenCoverage.year, GreenCoverage.data_source, GreenCoverage.measurement_method,
+    GreenCoverage.notes, GreenCoverage.total_area_km2, GreenCoverage.green_area_km2,
+    GreenCoverage.ndvi_threshold, GreenCoverage.mean_ndvi, GreenCoverage.std_ndvi,
+    GreenCoverage.min_ndvi, GreenCoverage.max_ndvi, GreenCoverage.coordinate_system,
+    GreenCoverage.total_pixels, GreenCoverage.green_pixels, GreenCoverage.created_at,
+    GreenCoverage.updated_at
+)
+
+_parks_rtree_present: Optional[bool] = None
+
+
+def _has_parks_rtree(db: Session) -> bool:
+    """Whether the SQLite parks_rtree spatial index exists (checked once per process)."""
+    global _parks_rtree_present
+    if _parks_rtree_present is None:
+        _parks_rtree_present = inspect(db.get_bind()).has_table("parks_rtree")
+    return _parks_rtree_present
+
+
+def insert_returning(db: Session, model, values: dict):
+    """
+    Insert one row and commit, returning the stored row from INSERT ... RETURNING.
+    
+    Args:
+        db: Database session
+        model: ORM model class whose table receives the row
+        values: Column values for the new row
+        
+    Returns:
+        Mapping of every column of the inserted row, including database defaults
+    """
+    row = db.execute(insert(model).values(**values).returning(*model.__table__.c)).one()
+    db.commit()
+    return row._mapping
+
+
+def find_city_by_name(db: Session, city_name: str) -> Optional[City]:
+    """Find a city by exact, case-insensitive name (served by the lower(name) index)."""
+    return db.execute(
+        select(City).where(func.lower(City.name) == func.lower(city_name.strip())).limit(1)
+    ).scalar_one_or_none()
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, Optional[float], Optional[float]]:
+    """
+    Compute a latitude/longitude box containing every point within radius_km.
+    
+    The box is exact for the spherical model used by calculate_distance, so it
+    can prefilter candidates in SQL without dropping any point inside the radius.
+    
+    Returns:
+        (min_lat, max_lat, min_lon, max_lon); the longitude bounds are None when
+        the box touches a pole or crosses the antimeridian.
+    """
+    angular = radius_km / EARTH_RADIUS_KM
+    lat = math.radians(latitude)
+    min_lat = math.degrees(lat - angular)
+    max_lat = math.degrees(lat + angular)
+    
+    if min_lat <= -90 or max_lat >= 90 or math.sin(angular) >= math.cos(lat):
+        return max(min_lat, -90.0), min(max_lat, 90.0), None, None
+    
+    delta_lon = math.degrees(math.asin(math.sin(angular) / math.cos(lat)))
+    min_lon = longitude - delta_lon
+    max_lon = longitude + delta_lon
+    if min_lon < -180 or max_lon > 180:
+        return min_lat, max_lat, None, None
+    
+    return min_lat, max_lat, min_lon, max_lon
 
 
 @app.get("/")
@@ -121,7 +318,7 @@ async def root(current_user: Optional[schemas.User] = Depends(get_current_user_o
             "full_name": current_user.full_name
         }
         
-        if current_user.role == "admin":
+        if check_admin_permission(current_user):
             response["admin_endpoints"] = {
                 "create_city": "POST /cities",
                 "update_city": "PUT /cities/{id}",
@@ -145,7 +342,7 @@ async def root(current_user: Optional[schemas.User] = Depends(get_current_user_o
 
 
 @app.post("/feedback", response_model=schemas.FeedbackResponse, status_code=status.HTTP_201_CREATED)
-async def submit_feedback(feedback: schemas.FeedbackCreate, db: Session = Depends(get_db)):
+def submit_feedback(feedback: schemas.FeedbackCreate, db: Session = Depends(get_db)):
     """
     Submit user feedback.
     
@@ -160,15 +357,15 @@ async def submit_feedback(feedback: schemas.FeedbackCreate, db: Session = Depend
         500: Internal server error if database operation fails
     """
     try:
-        # Create new feedback record
-        db_feedback = Feedback(**feedback.dict())
-        db.add(db_feedback)
+        # Create new feedback record; RETURNING hands back the id without a refresh query
+        feedback_id = db.execute(
+            insert(Feedback).values(**feedback.model_dump()).returning(Feedback.id)
+        ).scalar_one()
         db.commit()
-        db.refresh(db_feedback)
         
         return schemas.FeedbackResponse(
             message="Thank you for your feedback! We appreciate your input.",
-            feedback_id=db_feedback.id
+            feedback_id=feedback_id
         )
     except Exception as e:
         db.rollback()
@@ -178,11 +375,30 @@ async def submit_feedback(feedback: schemas.FeedbackCreate, db: Session = Depend
         )
 
 
+def static_json_response(body: bytes) -> Response:
+    """
+    Wrap a pre-encoded JSON body in a fresh response.
+    
+    The body is shared, but each request gets its own Response object because
+    middleware (e.g. CORS) appends headers to the response in place.
+    
+    Args:
+        body: JSON bytes encoded once at import time
+        
+    Returns:
+        JSON response carrying the body as-is
+    """
+    return Response(body, media_type="application/json")
+
+
+_HEALTH_BODY = orjson.dumps({"status": "healthy", "message": "API is running"})
+
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy", "message": "API is running"}
+    return static_json_response(_HEALTH_BODY)
 
 
 @app.get("/health/external-apis")
@@ -196,19 +412,7 @@ async def external_apis_health_check():
         }
     
     try:
-        # Use a simple in-memory cache for external data health check
-        class SimpleCache:
-            def __init__(self):
-                self.cache = {}
-            
-            async def get(self, key):
-                return self.cache.get(key)
-            
-            async def set(self, key, value, ttl=None):
-                self.cache[key] = value
-        
-        cache_service = SimpleCache()
-        external_service = get_external_data_service(cache_service)
+        external_service = get_external_data_service(_external_data_cache)
         health_status = await external_service.health_check()
         
         # Count healthy APIs
@@ -227,7 +431,7 @@ async def external_apis_health_check():
         }
         
     except Exception as e:
-        api_logger.error(f"External API health check failed: {str(e)}")
+        api_logger.error("External API health check failed: %s", e)
         return {
             "status": "error",
             "message": f"Health check failed: {str(e)}",
@@ -237,14 +441,13 @@ async def external_apis_health_check():
 
 # Cities endpoints
 @app.get("/cities", response_model=List[schemas.City])
-async def get_cities(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_cities(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """Get all cities with optional pagination."""
-    cities = db.query(City).offset(skip).limit(limit).all()
-    return cities
+    return db.execute(select(City).offset(skip).limit(limit)).scalars().all()
 
 
 @app.get("/city/search", response_model=List[schemas.City])
-async def search_cities(
+def search_cities(
     name: str,
     limit: int = 10,
     db: Session = Depends(get_db)
@@ -297,19 +500,18 @@ async def search_cities_enhanced(
             detail="City name parameter is required and must be at least 1 character"
         )
     
-    # Get base city data from database
-    cities = db.query(City).filter(
-        City.name.ilike(f"%{name.strip()}%")
-    ).limit(limit).all()
+    # Get base city data from database; the sync query runs in a worker thread
+    # so the event loop stays free for other requests' external API calls
+    pattern = f"%{name.strip()}%"
+    cities = await run_in_threadpool(
+        lambda: db.query(City).filter(City.name.ilike(pattern)).limit(limit).all()
+    )
     
     if not cities:
         return []
     
-    enhanced_cities = []
-    
-    for city in cities:
-        # Convert to dict for easier manipulation
-        city_data = {
+    enhanced_cities = [
+        {
             "id": city.id,
             "name": city.name,
             "country": city.country,
@@ -321,49 +523,35 @@ async def search_cities_enhanced(
             "description": city.description,
             "realtime_data": None
         }
+        for city in cities
+    ]
+    
+    # Add real-time data if requested and external data is enabled
+    if include_realtime and settings.enable_external_data:
+        external_service = get_external_data_service(_external_data_cache)
         
-        # Add real-time data if requested and external data is enabled
-        if include_realtime and settings.enable_external_data:
-            try:
-                # Use a simple in-memory cache for external data since we have a different cache system
-                class SimpleCache:
-                    def __init__(self):
-                        self.cache = {}
-                    
-                    async def get(self, key):
-                        return self.cache.get(key)
-                    
-                    async def set(self, key, value, ttl=None):
-                        self.cache[key] = value
-                
-                cache_service = SimpleCache()
-                external_service = get_external_data_service(cache_service)
-                
-                # Fetch enhanced data
-                realtime_data = await external_service.get_enhanced_city_data(
-                    city.name, 
-                    city.country, 
-                    float(city.latitude), 
-                    float(city.longitude)
-                )
-                
-                city_data["realtime_data"] = realtime_data
-                api_logger.info(f"Enhanced data fetched for {city.name}, {city.country}")
-                
-            except Exception as e:
-                api_logger.error(f"Failed to fetch enhanced data for {city.name}: {str(e)}")
+        # Fetch enhanced data for all cities concurrently
+        results = await asyncio.gather(
+            *(get_enhanced_city_data_memoized(external_service, city) for city in cities),
+            return_exceptions=True
+        )
+        
+        for city, city_data, realtime_data in zip(cities, enhanced_cities, results):
+            if isinstance(realtime_data, BaseException):
+                api_logger.error("Failed to fetch enhanced data for %s: %s", city.name, realtime_data)
                 city_data["realtime_data"] = {
                     "error": "Failed to fetch real-time data",
                     "timestamp": None
                 }
-        
-        enhanced_cities.append(city_data)
+            else:
+                city_data["realtime_data"] = realtime_data
+                api_logger.info("Enhanced data fetched for %s, %s", city.name, city.country)
     
     return enhanced_cities
 
 
 @app.get("/cities/{city_id}", response_model=schemas.City)
-async def get_city(city_id: int, db: Session = Depends(get_db)):
+def get_city(city_id: int, db: Session = Depends(get_db)):
     """Get a specific city by ID."""
     city = db.query(City).filter(City.id == city_id).first()
     if city is None:
@@ -372,21 +560,17 @@ async def get_city(city_id: int, db: Session = Depends(get_db)):
 
 
 @app.post("/cities", response_model=schemas.City, status_code=status.HTTP_201_CREATED)
-async def create_city(
+def create_city(
     city: schemas.CityCreate, 
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(get_admin_user)
 ):
     """Create a new city (admin only)."""
-    db_city = City(**city.dict())
-    db.add(db_city)
-    db.commit()
-    db.refresh(db_city)
-    return db_city
+    return insert_returning(db, City, city.model_dump())
 
 
 @app.put("/cities/{city_id}", response_model=schemas.City)
-async def update_city(
+def update_city(
     city_id: int,
     city_data: schemas.CityCreate,
     db: Session = Depends(get_db),
@@ -397,7 +581,8 @@ async def update_city(
     if not city:
         raise HTTPException(status_code=404, detail="City not found")
     
-    for field, value in city_data.dict().items():
+    shapefile.forget_city_id(city.name)
+    for field, value in city_data.model_dump().items():
         setattr(city, field, value)
     
     db.commit()
@@ -406,7 +591,7 @@ async def update_city(
 
 
 @app.delete("/cities/{city_id}")
-async def delete_city(
+def delete_city(
     city_id: int,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(get_admin_user)
@@ -416,9 +601,9 @@ async def delete_city(
     if not city:
         raise HTTPException(status_code=404, detail="City not found")
     
-    # Check if city has associated parks
-    parks_count = db.query(Park).filter(Park.city_id == city_id).count()
-    if parks_count > 0:
+    # Check if city has associated parks (EXISTS stops at the first row; count only on error)
+    if db.query(exists().where(Park.city_id == city_id)).scalar():
+        parks_count = db.query(Park).filter(Park.city_id == city_id).count()
         raise HTTPException(
             status_code=400, 
             detail=f"Cannot delete city with {parks_count} associated parks. Delete parks first."
@@ -426,27 +611,27 @@ async def delete_city(
     
     db.delete(city)
     db.commit()
+    shapefile.forget_city_id(city.name)
     return {"message": f"City '{city.name}' deleted successfully"}
 
 
 # Parks endpoints
 @app.get("/parks", response_model=List[schemas.Park])
-async def get_parks(
+def get_parks(
     city_id: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db)
 ):
     """Get all parks with optional city filtering and pagination."""
-    query = db.query(Park)
+    stmt = select(Park)
     if city_id:
-        query = query.filter(Park.city_id == city_id)
-    parks = query.offset(skip).limit(limit).all()
-    return parks
+        stmt = stmt.where(Park.city_id == city_id)
+    return db.execute(stmt.offset(skip).limit(limit)).scalars().all()
 
 
 @app.get("/parks/nearest", response_model=List[schemas.NearestParkResponse])
-async def get_nearest_parks(
+def get_nearest_parks(
     latitude: float = Query(..., description="User's latitude", ge=-90, le=90),
     longitude: float = Query(..., description="User's longitude", ge=-180, le=180),
     radius_km: float = Query(5.0, description="Search radius in kilometers", ge=0.1, le=50),
@@ -468,38 +653,64 @@ async def get_nearest_parks(
         - Distance from user location
         - Park coordinates
     """
-    # Get all parks with coordinates
-    parks = db.query(Park).filter(
-        Park.latitude.isnot(None),
-        Park.longitude.isnot(None)
-    ).all()
+    # Only consider parks inside the radius' bounding box; exact distances are checked below
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    stmt = select(Park.id, Park.latitude, Park.longitude)
+    if _has_parks_rtree(db):
+        # Spatial index lookup; boxes are rounded outward, so overlap never drops a park
+        stmt = stmt.join(parks_rtree, parks_rtree.c.id == Park.id).where(
+            parks_rtree.c.max_lat >= min_lat,
+            parks_rtree.c.min_lat <= max_lat
+        )
+        if min_lon is not None:
+            stmt = stmt.where(parks_rtree.c.max_lon >= min_lon, parks_rtree.c.min_lon <= max_lon)
+    else:
+        stmt = stmt.where(
+            Park.latitude.isnot(None),
+            Park.longitude.isnot(None),
+            Park.latitude.between(min_lat, max_lat)
+        )
+        if min_lon is not None:
+            stmt = stmt.where(Park.longitude.between(min_lon, max_lon))
     
-    if not parks:
+    # Stream candidates from the cursor in batches straight into an (n, 3) array
+    result = db.execute(stmt.execution_options(yield_per=NEAREST_PARKS_BATCH_SIZE))
+    batches = [np.array(batch, dtype=np.float64) for batch in result.partitions()]
+    if not batches:
         return []
+    candidates = np.concatenate(batches)
     
-    # Calculate distances and filter within radius
+    # Calculate all distances at once and keep the nearest parks within radius
+    ids = candidates[:, 0].astype(np.int64)
+    distances = haversine_distances(latitude, longitude, candidates[:, 1], candidates[:, 2])
+    within = np.flatnonzero(distances <= radius_km)
+    nearest = within[np.argsort(distances[within], kind="stable")[:limit]]
+    
+    if nearest.size == 0:
+        return []
+    
+    stmt = select(Park).where(Park.id.in_(ids[nearest].tolist())).options(load_only(
+        Park.name, Park.area_hectares, Park.facilities, Park.latitude, Park.longitude
+    ))
+    parks = {park.id: park for park in db.execute(stmt).scalars()}
     parks_with_distance = []
-    for park in parks:
-        distance = calculate_distance(latitude, longitude, park.latitude, park.longitude)
-        
-        if distance <= radius_km:
-            parks_with_distance.append({
-                "id": park.id,
-                "name": park.name,
-                "area_hectares": park.area_hectares,
-                "amenities": park.facilities,  # Using facilities as amenities
-                "distance_km": round(distance, 2),
-                "latitude": park.latitude,
-                "longitude": park.longitude
-            })
-    
-    # Sort by distance and limit results
-    parks_with_distance.sort(key=lambda x: x["distance_km"])
-    return parks_with_distance[:limit]
+    for i in nearest:
+        park = parks[int(ids[i])]
+        parks_with_distance.append({
+            "id": park.id,
+            "name": park.name,
+            "area_hectares": park.area_hectares,
+            "amenities": park.facilities,  # Using facilities as amenities
+            "distance_km": round(float(distances[i]), 2),
+            "latitude": park.latitude,
+            "longitude": park.longitude
+        })
+    
+    return parks_with_distance
 
 
 @app.get("/parks/{park_id}", response_model=schemas.Park)
-async def get_park(park_id: int, db: Session = Depends(get_db)):
+def get_park(park_id: int, db: Session = Depends(get_db)):
     """Get a specific park by ID."""
     park = db.query(Park).filter(Park.id == park_id).first()
     if park is None:
@@ -508,7 +719,7 @@ async def get_park(park_id: int, db: Session = Depends(get_db)):
 
 
 @app.post("/parks", response_model=schemas.Park, status_code=status.HTTP_201_CREATED)
-async def create_park(
+def create_park(
     park: schemas.ParkCreate, 
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(get_admin_user)
@@ -519,15 +730,11 @@ async def create_park(
     if not city:
         raise HTTPException(status_code=404, detail="City not found")
     
-    db_park = Park(**park.dict())
-    db.add(db_park)
-    db.commit()
-    db.refresh(db_park)
-    return db_park
+    return insert_returning(db, Park, park.model_dump())
 
 
 @app.put("/parks/{park_id}", response_model=schemas.Park)
-async def update_park(
+def update_park(
     park_id: int,
     park_data: schemas.ParkCreate,
     db: Session = Depends(get_db),
@@ -544,7 +751,7 @@ async def update_park(
         if not city:
             raise HTTPException(status_code=404, detail="City not found")
     
-    for field, value in park_data.dict().items():
+    for field, value in park_data.model_dump().items():
         setattr(park, field, value)
     
     db.commit()
@@ -553,7 +760,7 @@ async def update_park(
 
 
 @app.delete("/parks/{park_id}")
-async def delete_park(
+def delete_park(
     park_id: int,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(get_admin_user)
@@ -571,7 +778,7 @@ async def delete_park(
 
 # Green Coverage endpoints
 @app.get("/green-coverage", response_model=List[schemas.GreenCoverage])
-async def get_green_coverage(
+def get_green_coverage(
     city_id: Optional[int] = None,
     year: Optional[int] = None,
     skip: int = 0,
@@ -579,17 +786,17 @@ async def get_green_coverage(
     db: Session = Depends(get_db)
 ):
     """Get green coverage data with optional filtering."""
-    query = db.query(GreenCoverage)
+    # Skip the file paths and processing metadata, which the response never includes
+    stmt = select(GreenCoverage).options(load_only(*_COVERAGE_RESPONSE_COLUMNS))
     if city_id:
-        query = query.filter(GreenCoverage.city_id == city_id)
+        stmt = stmt.where(GreenCoverage.city_id == city_id)
     if year:
-        query = query.filter(GreenCoverage.year == year)
-    coverage = query.offset(skip).limit(limit).all()
-    return coverage
+        stmt = stmt.where(GreenCoverage.year == year)
+    return db.execute(stmt.offset(skip).limit(limit)).scalars().all()
 
 
 @app.get("/green-coverage/{coverage_id}", response_model=schemas.GreenCoverage)
-async def get_green_coverage_by_id(coverage_id: int, db: Session = Depends(get_db)):
+def get_green_coverage_by_id(coverage_id: int, db: Session = Depends(get_db)):
     """Get specific green coverage record by ID."""
     coverage = db.query(GreenCoverage).filter(GreenCoverage.id == coverage_id).first()
     if coverage is None:
@@ -598,7 +805,7 @@ async def get_green_coverage_by_id(coverage_id: int, db: Session = Depends(get_d
 
 
 @app.post("/green-coverage", response_model=schemas.GreenCoverage, status_code=status.HTTP_201_CREATED)
-async def create_green_coverage(
+def create_green_coverage(
     coverage: schemas.GreenCoverageCreate, 
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(get_admin_user)
@@ -621,18 +828,35 @@ async def create_green_coverage(
         )
     
     # Set city_name from city record
-    coverage_data = coverage.dict()
+    coverage_data = coverage.model_dump()
     coverage_data["city_name"] = city.name
     
-    db_coverage = GreenCoverage(**coverage_data)
-    db.add(db_coverage)
-    db.commit()
-    db.refresh(db_coverage)
-    return db_coverage
+    return insert_returning(db, GreenCoverage, coverage_data)
+
+
+# Comparison wording by gap to the WHO recommendation, in percentage points.
+# A difference of exactly a bound falls in the tier further from zero.
+_COMPARISON_BOUNDS = (-15, -10, -5, 0, 5, 10)
+_COMPARISON_TEMPLATES = (
+    "Critical: {city} is {delta:.1f} percentage points below WHO recommendations. Significant improvement in green infrastructure is needed.",
+    "Below standard: {city} is {delta:.1f} percentage points below WHO recommendations. More green spaces are needed.",
+    "Moderate gap: {city} is {delta:.1f} percentage points below WHO recommendations. Additional green initiatives would be beneficial.",
+    "Nearly meets standard: {city} is {delta:.1f} percentage points below WHO recommendations. Small improvements would reach the target.",
+    "Good! {city} meets WHO recommendations with {delta:.1f} percentage points above the threshold.",
+    "Great! {city} exceeds WHO recommendations by {delta:.1f} percentage points, showing good environmental planning.",
+    "Excellent! {city} exceeds WHO recommendations by {delta:.1f} percentage points, indicating a very healthy urban environment.",
+)
+
+
+def describe_coverage_gap(city_name: str, difference: float) -> str:
+    """Describe how a city's coverage compares to the WHO recommendation."""
+    find_tier = bisect_right if difference >= 0 else bisect_left
+    template = _COMPARISON_TEMPLATES[find_tier(_COMPARISON_BOUNDS, difference)]
+    return template.format(city=city_name, delta=abs(difference))
 
 
 @app.get("/coverage/compare", response_model=schemas.GreenCoverageComparisonResponse)
-async def compare_green_coverage(
+def compare_green_coverage(
     city_name: str = Query(..., description="Name of the city to compare green coverage"),
     db: Session = Depends(get_db)
 ):
@@ -652,19 +876,19 @@ async def compare_green_coverage(
     # WHO recommends at least 30% green coverage for urban areas
     WHO_RECOMMENDATION_PERCENTAGE = 30.0
     
-    # Find the city (case-insensitive search)
-    city = db.query(City).filter(City.name.ilike(city_name.strip())).first()
-    if not city:
-        raise HTTPException(
-            status_code=404, 
-            detail=f"City '{city_name}' not found"
-        )
-    
     # Initialize cache service
     cache_service = CacheService(db)
     
-    # Define calculation function
+    # Define calculation function; a cache hit skips the city lookup entirely
     def calculate_comparison():
+        # Find the city (case-insensitive exact match)
+        city = find_city_by_name(db, city_name)
+        if not city:
+            raise HTTPException(
+                status_code=404, 
+                detail=f"City '{city_name}' not found"
+            )
+        
         # Get the most recent green coverage data for the city
         latest_coverage = db.query(GreenCoverage).filter(
             GreenCoverage.city_id == city.id
@@ -680,31 +904,16 @@ async def compare_green_coverage(
         city_coverage = latest_coverage.coverage_percentage
         difference = city_coverage - WHO_RECOMMENDATION_PERCENTAGE
         
-        if difference >= 0:
-            if difference >= 10:
-                comparison_result = f"Excellent! {city.name} exceeds WHO recommendations by {difference:.1f} percentage points, indicating a very healthy urban environment."
-            elif difference >= 5:
-                comparison_result = f"Great! {city.name} exceeds WHO recommendations by {difference:.1f} percentage points, showing good environmental planning."
-            else:
-                comparison_result = f"Good! {city.name} meets WHO recommendations with {difference:.1f} percentage points above the threshold."
-        else:
-            abs_difference = abs(difference)
-            if abs_difference >= 15:
-                comparison_result = f"Critical: {city.name} is {abs_difference:.1f} percentage points below WHO recommendations. Significant improvement in green infrastructure is needed."
-            elif abs_difference >= 10:
-                comparison_result = f"Below standard: {city.name} is {abs_difference:.1f} percentage points below WHO recommendations. More green spaces are needed."
-            elif abs_difference >= 5:
-                comparison_result = f"Moderate gap: {city.name} is {abs_difference:.1f} percentage points below WHO recommendations. Additional green initiatives would be beneficial."
-            else:
-                comparison_result = f"Nearly meets standard: {city.name} is {abs_difference:.1f} percentage points below WHO recommendations. Small improvements would reach the target."
+        comparison_result = describe_coverage_gap(city.name, difference)
         
+        # Cached as JSON, so hand back a plain dict
         return schemas.GreenCoverageComparisonResponse(
             city_name=city.name,
             city_green_coverage_percentage=city_coverage,
             who_recommendation_percentage=WHO_RECOMMENDATION_PERCENTAGE,
             comparison_result=comparison_result,
             year=latest_coverage.year
-        )
+        ).model_dump()
     
     # Use cache service to get or calculate comparison
     return cache_service.get_or_calculate_coverage_comparison(
@@ -714,7 +923,7 @@ async def compare_green_coverage(
 
 
 @app.get("/coverage/trend", response_model=List[schemas.GreenCoverageTrend])
-async def get_green_coverage_trend(
+def get_green_coverage_trend(
     city_name: str = Query(..., description="Name of the city to get coverage trend for"),
     start_year: Optional[int] = Query(None, description="Start year for trend data"),
     end_year: Optional[int] = Query(None, description="End year for trend data"),
@@ -735,52 +944,47 @@ async def get_green_coverage_trend(
         - Total area and green area in km²
         - Data source and measurement method
     """
-    # Find the city (case-insensitive search)
-    city = db.query(City).filter(City.name.ilike(city_name.strip())).first()
+    # Find the city (case-insensitive exact match)
+    city = find_city_by_name(db, city_name)
     if not city:
         raise HTTPException(
             status_code=404, 
             detail=f"City '{city_name}' not found"
         )
     
-    # Build query for historical coverage data
-    query = db.query(GreenCoverage).filter(GreenCoverage.city_id == city.id)
+    # Select only the trend columns; rows skip the ORM and validate straight into the response
+    stmt = select(
+        GreenCoverage.year,
+        GreenCoverage.coverage_percentage,
+        GreenCoverage.total_area_km2,
+        GreenCoverage.green_area_km2,
+        GreenCoverage.data_source,
+        GreenCoverage.measurement_method,
+        GreenCoverage.mean_ndvi,
+        GreenCoverage.created_at
+    ).where(GreenCoverage.city_id == city.id)
     
     # Apply year filters if provided
     if start_year:
-        query = query.filter(GreenCoverage.year >= start_year)
+        stmt = stmt.where(GreenCoverage.year >= start_year)
     if end_year:
-        query = query.filter(GreenCoverage.year <= end_year)
+        stmt = stmt.where(GreenCoverage.year <= end_year)
     
     # Order by year ascending for trend visualization
-    coverage_data = query.order_by(GreenCoverage.year.asc()).all()
+    trend_data = db.execute(stmt.order_by(GreenCoverage.year.asc())).mappings().all()
     
-    if not coverage_data:
+    if not trend_data:
         raise HTTPException(
             status_code=404,
             detail=f"No green coverage trend data found for city '{city.name}'"
         )
     
-    # Convert to response format
-    trend_data = []
-    for coverage in coverage_data:
-        trend_data.append(schemas.GreenCoverageTrend(
-            year=coverage.year,
-            coverage_percentage=coverage.coverage_percentage,
-            total_area_km2=coverage.total_area_km2,
-            green_area_km2=coverage.green_area_km2,
-            data_source=coverage.data_source,
-            measurement_method=coverage.measurement_method,
-            mean_ndvi=coverage.mean_ndvi,
-            created_at=coverage.created_at
-        ))
-    
     return trend_data
 
 
 # Statistics endpoints
 @app.get("/cities/{city_id}/stats")
-async def get_city_stats(city_id: int, db: Session = Depends(get_db)):
+def get_city_stats(city_id: int, db: Session = Depends(get_db)):
     """Get comprehensive statistics for a city."""
     city = db.query(City).filter(City.id == city_id).first()
     if not city:
@@ -791,27 +995,30 @@ async def get_city_stats(city_id: int, db: Session = Depends(get_db)):
     
     # Define calculation function
     def calculate_stats():
-        # Count parks
-        park_count = db.query(Park).filter(Park.city_id == city_id).count()
+        # Count parks and total park area in one aggregate query
+        park_count, total_park_area = db.query(
+            func.count(Park.id), func.sum(Park.area_hectares)
+        ).filter(Park.city_id == city_id).one()
         
-        # Get latest green coverage
-        latest_coverage = db.query(GreenCoverage).filter(
+        # Coverage history, newest first; its head is the latest coverage
+        history = db.query(GreenCoverage).filter(
             GreenCoverage.city_id == city_id
-        ).order_by(GreenCoverage.year.desc()).first()
-        
-        # Calculate total park area
-        total_park_area = db.query(Park).filter(Park.city_id == city_id).with_entities(
-            db.func.sum(Park.area_hectares)
-        ).scalar() or 0
+        ).order_by(GreenCoverage.year.desc()).all()
+        latest_coverage = history[0] if history else None
         
+        # Cached as JSON, so serialize ORM rows through their schemas
         return {
-            "city": city,
+            "city": schemas.City.model_validate(city).model_dump(mode="json"),
             "park_count": park_count,
-            "total_park_area_hectares": total_park_area,
-            "latest_green_coverage": latest_coverage,
-            "green_coverage_history": db.query(GreenCoverage).filter(
-                GreenCoverage.city_id == city_id
-            ).order_by(GreenCoverage.year.desc()).all()
+            "total_park_area_hectares": total_park_area or 0,
+            "latest_green_coverage": (
+                schemas.GreenCoverage.model_validate(latest_coverage).model_dump(mode="json")
+                if latest_coverage else None
+            ),
+            "green_coverage_history": [
+                schemas.GreenCoverage.model_validate(coverage).model_dump(mode="json")
+                for coverage in history
+            ]
         }
     
     # Use cache service to get or calculate stats
@@ -824,14 +1031,14 @@ async def get_city_stats(city_id: int, db: Session = Depends(get_db)):
 
 # Cache management endpoints
 @app.get("/cache/stats")
-async def get_cache_stats(db: Session = Depends(get_db)):
+def get_cache_stats(db: Session = Depends(get_db)):
     """Get statistics about the cache."""
     cache_service = CacheService(db)
     return cache_service.get_cache_stats()
 
 
 @app.post("/cache/cleanup")
-async def cleanup_expired_cache(
+def cleanup_expired_cache(
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(get_admin_user)
 ):
@@ -842,7 +1049,7 @@ async def cleanup_expired_cache(
 
 
 @app.delete("/cache/city/{city_name}")
-async def invalidate_city_cache(
+def invalidate_city_cache(
     city_name: str,
     calculation_type: Optional[str] = Query(None, description="Specific calculation type to invalidate"),
     db: Session = Depends(get_db),
@@ -861,52 +1068,84 @@ async def get_background_task_status():
     return background_task_service.get_task_status()
 
 
-@app.post("/background-tasks/trigger-update")
+@app.post("/background-tasks/trigger-update", status_code=status.HTTP_202_ACCEPTED)
 async def trigger_manual_green_coverage_update(
     city_name: Optional[str] = Query(None, description="Optional city name to update specifically"),
     current_user: schemas.User = Depends(get_admin_user)
 ):
     """
-    Manually trigger green coverage update for all cities or a specific city (admin only).
+    Queue a manual green coverage update for all cities or a specific city (admin only).
     
     Args:
         city_name: Optional city name to update. If not provided, updates all cities.
         current_user: Current authenticated admin user
         
     Returns:
-        Update results including processed count, errors, and duration
+        Queued job record; poll /background-tasks/status/{job_id} for the results
     """
-    result = await background_task_service.trigger_manual_update(city_name)
-    return result
+    return await background_task_service.enqueue_manual_update(city_name)
+
+
+@app.get("/background-tasks/status/{job_id}")
+def get_manual_update_job_status(
+    job_id: str,
+    current_user: schemas.User = Depends(get_admin_user)
+):
+    """
+    Get the status of a queued manual update job (admin only).
+    
+    Args:
+        job_id: Job identifier returned by /background-tasks/trigger-update
+        current_user: Current authenticated admin user
+        
+    Returns:
+        Job status, timestamps and, once finished, the update results
+    """
+    job = background_task_service.get_job_status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+
+_TASKS_ALREADY_RUNNING = orjson.dumps({"message": "Background tasks are already running"})
+_TASKS_NOT_STARTED = orjson.dumps({"message": "Background tasks are disabled or running in another process"})
+_TASKS_STARTED = orjson.dumps({"message": "Background tasks started successfully"})
+_TASKS_NOT_RUNNING = orjson.dumps({"message": "Background tasks are not currently running"})
+_TASKS_STOPPED = orjson.dumps({"message": "Background tasks stopped successfully"})
 
 
 @app.post("/background-tasks/start")
 async def start_background_tasks(current_user: schemas.User = Depends(get_admin_user)):
     """Start the background task scheduler (admin only)."""
     if background_task_service.is_running:
-        return {"message": "Background tasks are already running"}
+        return static_json_response(_TASKS_ALREADY_RUNNING)
     
     await background_task_service.start_scheduler()
-    return {"message": "Background tasks started successfully"}
+    if not background_task_service.is_running:
+        return static_json_response(_TASKS_NOT_STARTED)
+    return static_json_response(_TASKS_STARTED)
 
 
 @app.post("/background-tasks/stop")
 async def stop_background_tasks(current_user: schemas.User = Depends(get_admin_user)):
     """Stop the background task scheduler (admin only)."""
     if not background_task_service.is_running:
-        return {"message": "Background tasks are not currently running"}
+        return static_json_response(_TASKS_NOT_RUNNING)
     
     await background_task_service.stop_scheduler()
-    return {"message": "Background tasks stopped successfully"}
+    return static_json_response(_TASKS_STOPPED)
 
 
 if __name__ == "__main__":
     import uvicorn
     
-    api_logger.info(f"Starting server on {settings.api_host}:{settings.api_port}")
+    api_logger.info("Starting server on %s:%s", settings.api_host, settings.api_port)
     uvicorn.run(
         app, 
         host=settings.api_host, 
         port=settings.api_port,
-        log_level=settings.log_level.lower()
+        log_level=settings.log_level.lower(),
+        # uvloop and httptools from uvicorn[standard] when installed; uvloop is not available on Windows
+        loop="auto",
+        http="auto"
     )
\ No newline at end of file
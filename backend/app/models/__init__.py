@@ -5,5 +5,6 @@ from .green_coverage import GreenCoverage
 from .cache import CoverageCache
 from .feedback import Feedback
 from .user import User, UserRole
+from .background_job import BackgroundJob
 
-__all__ = ["City", "Park", "GreenCoverage", "CoverageCache", "Feedback", "User", "UserRole"]
\ No newline at end of file
+__all__ = ["City", "Park", "GreenCoverage", "CoverageCache", "Feedback", "User", "UserRole", "BackgroundJob"]
\ No newline at end of file
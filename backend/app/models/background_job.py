@@ -0,0 +1,58 @@
+"""
+Manual update job model, shared by every API worker process.
+"""
+
+from sqlalchemy import Column, String, DateTime, Index, CheckConstraint, JSON
+
+from app.database import Base
+
+
+class BackgroundJob(Base):
+    """
+    Manual green coverage update queued through the API.
+    
+    Attributes:
+        id: Job identifier returned to the client
+        city_name: City to update, or None for all cities
+        status: queued, running, completed or failed
+        queued_at: When the job was queued
+        started_at: When the job took a concurrency slot
+        finished_at: When the job completed or failed
+        heartbeat_at: Last time the owning process reported the job alive
+        result: Update results, or {"error": ...} for failed jobs
+    """
+    
+    __tablename__ = "background_jobs"
+    
+    id = Column(String(32), primary_key=True)
+    city_name = Column(String(100), nullable=True)
+    status = Column(String(16), nullable=False, default="queued")
+    queued_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=False)
+    result = Column(JSON, nullable=True)
+    
+    # Slot counting and stale-job sweeps filter on status and heartbeat
+    __table_args__ = (
+        Index('idx_background_jobs_status', 'status', 'heartbeat_at'),
+        CheckConstraint(
+            "status IN ('queued', 'running', 'completed', 'failed')",
+            name='ck_background_jobs_status'
+        ),
+    )
+    
+    def __repr__(self):
+        return f"<BackgroundJob(id='{self.id}', status='{self.status}')>"
+    
+    def to_dict(self):
+        """Convert the job to its API representation."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "city_name": self.city_name,
+            "queued_at": self.queued_at.isoformat() if self.queued_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "result": self.result
+        }
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from sqlalchemy import Column, Integer, String, DateTime, Index, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -8,17 +9,24 @@ class CoverageCache(Base):
     __tablename__ = "coverage_cache"
 
     id = Column(Integer, primary_key=True, index=True)
-    city_id = Column(Integer, nullable=True, index=True)  # Nullable for shapefile-based calculations
-    city_name = Column(String(100), nullable=False, index=True)
-    cache_key = Column(String(500), nullable=False, index=True)  # Hash of calculation parameters
-    cached_data = Column(Text, nullable=False)  # JSON string of calculation results
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
-    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
-    calculation_type = Column(String(50), nullable=False, index=True)  # 'satellite', 'stored', 'stats'
+    city_id = Column(Integer, nullable=True)  # Nullable for shapefile-based calculations
+    city_name = Column(String(100), nullable=False)
+    cache_key = Column(String(500), nullable=False)  # Hash of calculation parameters
+    cached_data = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)  # Calculation results; JSONB on PostgreSQL
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # Expiry sweeps
+    calculation_type = Column(String(50), nullable=False)  # 'satellite', 'stored', 'stats'
     
-    # Composite index for efficient cache lookups
+    # Composite index for efficient cache lookups; on PostgreSQL it also carries
+    # city_name. cached_data stays in the heap: large payloads would exceed the btree
+    # index row size limit (~2.7 kB) and fail the insert. Its leading columns
+    # (and those of idx_city_cache) cover cache_key and city_name lookups, so those
+    # columns carry no single-column indexes to keep cache writes cheap
     __table_args__ = (
-        Index('idx_cache_lookup', 'cache_key', 'calculation_type', 'expires_at'),
+        Index(
+            'idx_cache_lookup_covering', 'cache_key', 'calculation_type', 'expires_at',
+            postgresql_include=['city_name']
+        ),
         Index('idx_city_cache', 'city_name', 'calculation_type', 'expires_at'),
     )
 
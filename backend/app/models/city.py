@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text
+from sqlalchemy import Column, Integer, String, Float, Text, Index, func
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -19,6 +19,11 @@ class City(Base):
     # Relationships
     parks = relationship("Park", back_populates="city", cascade="all, delete-orphan")
     green_coverage = relationship("GreenCoverage", back_populates="city", cascade="all, delete-orphan")
+    
+    # Case-insensitive name lookups
+    __table_args__ = (
+        Index('ix_city_name_lower', func.lower(name)),
+    )
 
     def __repr__(self):
         return f"<City(name='{self.name}', country='{self.country}')>"
\ No newline at end of file
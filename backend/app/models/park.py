@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, Index, DDL, event
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import column, table
 from app.database import Base
 
 
@@ -8,7 +9,7 @@ class Park(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False, index=True)
-    city_id = Column(Integer, ForeignKey("cities.id"), nullable=False)
+    city_id = Column(Integer, ForeignKey("cities.id"), nullable=False, index=True)
     area_hectares = Column(Float)
     park_type = Column(String(100))  # e.g., "urban park", "national park", "botanical garden"
     latitude = Column(Float)
@@ -20,6 +21,49 @@ class Park(Base):
     
     # Relationship
     city = relationship("City", back_populates="parks")
+    
+    # Bounding-box prefilter for nearest-park searches; parks without coordinates are never searched
+    __table_args__ = (
+        Index(
+            'ix_parks_lat_lon', latitude, longitude,
+            sqlite_where=latitude.isnot(None),
+            postgresql_where=latitude.isnot(None)
+        ),
+    )
 
     def __repr__(self):
-        return f"<Park(name='{self.name}', city_id={self.city_id})>"
\ No newline at end of file
+        return f"<Park(name='{self.name}', city_id={self.city_id})>"
+
+
+# SQLite R*Tree spatial index over park coordinates, kept in sync by triggers.
+# R*Tree stores 32-bit floats rounded outward, so query it with overlap tests.
+parks_rtree = table(
+    "parks_rtree",
+    column("id"), column("min_lat"), column("max_lat"), column("min_lon"), column("max_lon")
+)
+
+PARKS_RTREE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS parks_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)",
+    """CREATE TRIGGER IF NOT EXISTS parks_rtree_insert AFTER INSERT ON parks
+    WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+    BEGIN
+        INSERT INTO parks_rtree VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS parks_rtree_update AFTER UPDATE OF latitude, longitude ON parks
+    BEGIN
+        DELETE FROM parks_rtree WHERE id = OLD.id;
+        INSERT INTO parks_rtree SELECT NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+        WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS parks_rtree_delete AFTER DELETE ON parks
+    BEGIN
+        DELETE FROM parks_rtree WHERE id = OLD.id;
+    END""",
+    # Backfill rows that existed before the index
+    """INSERT OR REPLACE INTO parks_rtree
+    SELECT id, latitude, latitude, longitude, longitude FROM parks
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL""",
+]
+
+for _statement in PARKS_RTREE_DDL:
+    event.listen(Park.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
@@ -2,9 +2,8 @@
 User model for authentication and authorization.
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum
-from sqlalchemy.ext.declarative import declarative_base
-from datetime import datetime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, CheckConstraint
+from sqlalchemy.sql import func
 import enum
 
 from app.database import Base
@@ -39,13 +38,19 @@ class User(Base):
     email = Column(String(100), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
     full_name = Column(String(100), nullable=True)
-    role = Column(Enum(UserRole), default=UserRole.VIEWER, nullable=False)
+    # Plain string column; UserRole is only used in application code
+    role = Column(String(16), default=UserRole.VIEWER.value, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     last_login = Column(DateTime, nullable=True)
     
+    # Username lookups use the unique username index
+    __table_args__ = (
+        CheckConstraint("role IN ('admin', 'viewer')", name='ck_users_role'),
+    )
+    
     def __repr__(self):
-        return f"<User(id={self.id}, username='{self.username}', role='{self.role.value}')>"
+        return f"<User(id={self.id}, username='{self.username}', role='{self.role}')>"
     
     def to_dict(self):
         """Convert user to dictionary (excluding sensitive fields)."""
@@ -54,7 +59,7 @@ class User(Base):
             "username": self.username,
             "email": self.email,
             "full_name": self.full_name,
-            "role": self.role.value,
+            "role": self.role,
             "is_active": self.is_active,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "last_login": self.last_login.isoformat() if self.last_login else None
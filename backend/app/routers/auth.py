@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 from typing import List
 
 from app.database import get_db
+from app.auth_dependencies import get_current_user, get_admin_user
 from app.services.auth_service import AuthService
 from app.auth_utils import AuthUtils
 from app import schemas
@@ -19,72 +20,12 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Only used by /verify-token; other endpoints authenticate through the shared, cached dependencies
 security = HTTPBearer()
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> schemas.User:
-    """
-    Get current user from JWT token.
-    
-    Args:
-        credentials: HTTP Bearer token credentials
-        db: Database session
-        
-    Returns:
-        Current user object
-        
-    Raises:
-        HTTPException: If token is invalid or user not found
-    """
-    # Verify token
-    token_data = AuthUtils.verify_token(credentials.credentials)
-    
-    # Get user from database
-    auth_service = AuthService(db)
-    user = auth_service.get_user_by_username(token_data.get("sub"))
-    
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    if not user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User account is deactivated"
-        )
-    
-    return user
-
-
-async def get_admin_user(current_user: schemas.User = Depends(get_current_user)) -> schemas.User:
-    """
-    Dependency to ensure current user is an admin.
-    
-    Args:
-        current_user: Current authenticated user
-        
-    Returns:
-        Current user if admin
-        
-    Raises:
-        HTTPException: If user is not an admin
-    """
-    if current_user.role != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin access required"
-        )
-    return current_user
-
-
 @router.post("/login", response_model=schemas.Token)
-async def login(
+def login(
     login_data: schemas.LoginRequest,
     db: Session = Depends(get_db)
 ):
@@ -113,7 +54,7 @@ async def login(
     
     # Create token
     access_token, expires_in = AuthUtils.create_token_for_user(
-        user.id, user.username, user.role.value
+        user.id, user.username, user.role
     )
     
     return {
@@ -124,7 +65,7 @@ async def login(
 
 
 @router.post("/register", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
-async def register(
+def register(
     user_data: schemas.UserCreate,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(get_admin_user)
@@ -164,7 +105,7 @@ async def get_current_user_info(current_user: schemas.User = Depends(get_current
 
 
 @router.put("/me", response_model=schemas.User)
-async def update_current_user(
+def update_current_user(
     user_data: schemas.UserUpdate,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(get_current_user)
@@ -199,7 +140,7 @@ async def update_current_user(
 
 
 @router.put("/change-password")
-async def change_password(
+def change_password(
     password_data: schemas.PasswordChange,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(get_current_user)
@@ -229,7 +170,7 @@ async def change_password(
 
 
 @router.get("/users", response_model=List[schemas.User])
-async def get_users(
+def get_users(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -253,8 +194,29 @@ async def get_users(
     return users
 
 
+@router.post("/users:lookup", response_model=List[schemas.User])
+def lookup_users(
+    lookup: schemas.UserLookupRequest,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(get_admin_user)
+):
+    """
+    Get several users by ID in a single request (admin only).
+    
+    Args:
+        lookup: IDs of the users to fetch
+        db: Database session
+        current_user: Current authenticated admin user
+        
+    Returns:
+        List of user information for the IDs that exist, ordered by ID
+    """
+    auth_service = AuthService(db)
+    return auth_service.get_users_by_ids(lookup.ids)
+
+
 @router.get("/users/{user_id}", response_model=schemas.User)
-async def get_user(
+def get_user(
     user_id: int,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(get_admin_user)
@@ -286,7 +248,7 @@ async def get_user(
 
 
 @router.put("/users/{user_id}", response_model=schemas.User)
-async def update_user(
+def update_user(
     user_id: int,
     user_data: schemas.UserUpdate,
     db: Session = Depends(get_db),
@@ -314,7 +276,7 @@ async def update_user(
 
 
 @router.delete("/users/{user_id}")
-async def deactivate_user(
+def deactivate_user(
     user_id: int,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(get_admin_user)
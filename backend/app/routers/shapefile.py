@@ -1,21 +1,339 @@
+from cachetools import TTLCache
 from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
-from typing import Optional
-import tempfile
-import os
+from typing import AsyncIterator, List, Optional, Tuple, Union
+import asyncio
+import logging
+import multiprocessing
+import threading
 import json
+import orjson
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
 from pathlib import Path
 
-from app.database import get_db
+from app.config import settings
+from app.database import SessionLocal, get_db
 from app.models import City, GreenCoverage
 from app import schemas
 from app.services.shapefile_service import shapefile_service
-from app.services.cache_service import CacheService
+from app.services.cache_service import CacheService, upload_content_hash
+from app.services.upload_store import upload_store
+
+logger = logging.getLogger("urban_api.shapefile")
 
 # Create router
 router = APIRouter(prefix="/shapefile", tags=["Shapefile & Satellite Imagery"])
 
+# Uploads are hashed and copied to disk in chunks of this size, so memory use stays flat for large rasters
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Uploads up to this size are handed to the shapefile service as bytes and read from memory;
+# larger ones are streamed to a temporary file
+IN_MEMORY_UPLOAD_LIMIT = 32 * 1024 * 1024
+
+# Accepted upload formats, by file extension
+SHAPEFILE_FORMATS = {
+    ".shp": "ESRI Shapefile",
+    ".geojson": "GeoJSON",
+    ".gpkg": "GeoPackage"
+}
+RASTER_FORMATS = {
+    ".tif": "GeoTIFF",
+    ".tiff": "GeoTIFF",
+    ".img": "ERDAS IMAGINE",
+    ".jp2": "JPEG 2000"
+}
+SHAPEFILE_EXTS = frozenset(SHAPEFILE_FORMATS)
+RASTER_EXTS = frozenset(RASTER_FORMATS)
+
+# Leading bytes each format must start with, checked before an upload is copied or parsed
+UPLOAD_SIGNATURES = {
+    ".shp": (b"\x00\x00\x27\x0a",),  # file code 9994, big-endian
+    ".geojson": (b"{",),  # after any BOM and whitespace
+    ".gpkg": (b"SQLite format 3\x00",),
+    ".tif": (b"II*\x00", b"MM\x00*", b"II+\x00", b"MM\x00+"),  # TIFF and BigTIFF
+    ".tiff": (b"II*\x00", b"MM\x00*", b"II+\x00", b"MM\x00+"),
+    ".img": (b"EHFA_HEADER_TAG",),
+    ".jp2": (b"\x00\x00\x00\x0cjP  \r\n\x87\n", b"\xff\x4f\xff\x51"),  # JP2 box or raw codestream
+}
+UPLOAD_SIGNATURE_BYTES = 512
+MAX_UPLOAD_SIZE = settings.max_upload_size_mb * 1024 * 1024
+
+# Static body of GET /supported-formats
+SUPPORTED_FORMATS = {
+    "shapefile_formats": SHAPEFILE_FORMATS,
+    "raster_formats": RASTER_FORMATS,
+    "requirements": {
+        "shapefile": "Must contain city/administrative boundaries",
+        "raster": "Must be satellite imagery with Red and NIR bands for NDVI calculation",
+        "coordinate_systems": "Shapefile and raster should ideally use the same CRS"
+    },
+    "recommendations": {
+        "raster_resolution": "Higher resolution imagery (10m or better) provides more accurate results",
+        "band_order": "Typical band order: Red=Band 1, NIR=Band 2 (adjust indices accordingly)",
+        "ndvi_threshold": "0.3 is a common threshold for vegetation, but may need adjustment based on region"
+    }
+}
+_SUPPORTED_FORMATS_JSON = orjson.dumps(SUPPORTED_FORMATS)
+
+# Calculation results copied verbatim into green_coverage columns of the same name.
+# The stats come from our own calculation, so they are not re-validated through a schema.
+COVERAGE_STAT_COLUMNS = (
+    'total_area_km2', 'green_area_km2', 'ndvi_threshold', 'mean_ndvi', 'std_ndvi',
+    'min_ndvi', 'max_ndvi', 'coordinate_system', 'total_pixels', 'green_pixels'
+)
+
+# Inspection results keyed on upload extension and content hash, so re-uploading the same
+# file skips GDAL. Only read and written from the event loop, so no lock is needed; the GDAL
+# work itself runs in a worker thread, and concurrent misses on one key may both compute it.
+INSPECTION_CACHE_TTL_SECONDS = 600
+_shapefile_info_cache = TTLCache(maxsize=256, ttl=INSPECTION_CACHE_TTL_SECONDS)
+_crs_validation_cache = TTLCache(maxsize=256, ttl=INSPECTION_CACHE_TTL_SECONDS)
+
+# NDVI calculations run in worker processes, created on first use (after Gunicorn forks).
+# Workers are spawned rather than forked so they don't inherit GDAL state or threads.
+_coverage_pool: Optional[ProcessPoolExecutor] = None
+_coverage_pool_lock = threading.Lock()
+
+# Lower-cased city name -> (id, stored name), so repeat uploads for a city skip the lookup
+CITY_ID_CACHE_TTL_SECONDS = 600
+_city_id_cache = TTLCache(maxsize=1024, ttl=CITY_ID_CACHE_TTL_SECONDS)
+_city_id_cache_lock = threading.Lock()
+
+
+def encode_model(model: BaseModel) -> bytes:
+    """
+    Serialize a response schema to JSON bytes with pydantic-core.
+    
+    Returning the encoded body skips FastAPI re-validating the model against the
+    route's response_model and running it through the JSON encoder a second time;
+    response_model is kept on the routes for the OpenAPI schema.
+    
+    Args:
+        model: Response schema instance
+        
+    Returns:
+        JSON-encoded model
+    """
+    return model.model_dump_json().encode()
+
+
+def json_response(body: bytes) -> Response:
+    """
+    Wrap an encoded JSON body in a fresh response.
+    
+    Bodies may be cached and shared, but each request gets its own Response object
+    because middleware (e.g. CORS) appends headers to the response in place.
+    
+    Args:
+        body: JSON bytes
+        
+    Returns:
+        JSON response carrying the body as-is
+    """
+    return Response(body, media_type="application/json")
+
+
+def upload_suffix(upload: UploadFile, allowed_exts: frozenset, kind: str) -> str:
+    """
+    Check that an upload has a filename with an accepted extension.
+    
+    Args:
+        upload: Uploaded file
+        allowed_exts: Accepted lower-cased extensions
+        kind: What the file is ("shapefile" or "raster"), for error messages
+        
+    Returns:
+        The lower-cased file extension
+        
+    Raises:
+        HTTPException: If the filename is missing or its extension is not accepted
+    """
+    if not upload.filename:
+        raise HTTPException(status_code=400, detail=f"A {kind} file is required")
+    
+    suffix = Path(upload.filename).suffix.lower()
+    if suffix not in allowed_exts:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported {kind} format: {suffix}. Supported formats: {', '.join(sorted(allowed_exts))}"
+        )
+    return suffix
+
+
+def check_upload_signature(head: bytes, suffix: str) -> None:
+    """
+    Reject an upload whose leading bytes do not match its extension.
+    
+    Args:
+        head: First bytes of the upload
+        suffix: Lower-cased file extension the upload claims
+        
+    Raises:
+        HTTPException: If the content does not look like the claimed format
+    """
+    if suffix == ".geojson":
+        head = head.removeprefix(b"\xef\xbb\xbf").lstrip()
+    if not head.startswith(UPLOAD_SIGNATURES[suffix]):
+        raise HTTPException(status_code=400, detail=f"File content does not match its {suffix} extension")
+
+
+def save_upload_to_store(upload: UploadFile, suffix: str) -> Tuple[str, str]:
+    """
+    Put an uploaded file into the content-addressed upload store.
+    
+    The upload's spool is hashed first; if the store already holds that content the
+    stored file is reused and nothing is written, otherwise the spool is copied in.
+    Call it from a worker thread, since the spool and the store are on disk.
+    
+    Args:
+        upload: Uploaded file
+        suffix: Lower-cased file extension, kept on the stored file so readers can detect the format
+        
+    Returns:
+        Tuple of (stored file path, content hash)
+        
+    Raises:
+        HTTPException: If the content does not match the extension
+    """
+    upload.file.seek(0)
+    head = upload.file.read(UPLOAD_SIGNATURE_BYTES)
+    check_upload_signature(head, suffix)
+    content_hash = upload_content_hash(head)
+    while chunk := upload.file.read(UPLOAD_CHUNK_SIZE):
+        content_hash.update(chunk)
+    digest = content_hash.hexdigest()
+    
+    stored_path = upload_store.path_for(digest, suffix)
+    if not upload_store.reuse(stored_path):
+        upload.file.seek(0)
+        upload_store.write(stored_path, upload.file, UPLOAD_CHUNK_SIZE)
+    return str(stored_path), digest
+
+
+def read_upload(upload: UploadFile, suffix: str) -> Tuple[bytes, str]:
+    """
+    Read an uploaded file's spool into memory and hash it.
+    
+    Args:
+        upload: Uploaded file
+        suffix: Lower-cased file extension the upload claims
+        
+    Returns:
+        Tuple of (file contents, content hash)
+        
+    Raises:
+        HTTPException: If the content does not match the extension
+    """
+    upload.file.seek(0)
+    check_upload_signature(upload.file.read(UPLOAD_SIGNATURE_BYTES), suffix)
+    upload.file.seek(0)
+    content = upload.file.read()
+    return content, upload_content_hash(content).hexdigest()
+
+
+def _calculate_green_coverage(**kwargs) -> dict:
+    """Pool entry point; module-level so it pickles by reference."""
+    return shapefile_service.calculate_green_coverage_from_files(**kwargs)
+
+
+def calculate_green_coverage_in_pool(**kwargs) -> dict:
+    """
+    Run the NDVI calculation in the coverage process pool and wait for it.
+    
+    Blocks the calling thread, so call it from a worker thread. The CPU-bound
+    NumPy work then runs on its own core without holding this process's GIL.
+    
+    Args:
+        **kwargs: Arguments for ShapefileService.calculate_green_coverage_from_files
+        
+    Returns:
+        Green coverage statistics
+    """
+    global _coverage_pool
+    with _coverage_pool_lock:
+        if _coverage_pool is None:
+            _coverage_pool = ProcessPoolExecutor(
+                max_workers=max(1, settings.coverage_pool_workers),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        pool = _coverage_pool
+    return pool.submit(_calculate_green_coverage, **kwargs).result()
+
+
+def shutdown_coverage_pool() -> None:
+    """Stop the coverage worker processes, if any were started."""
+    global _coverage_pool
+    with _coverage_pool_lock:
+        pool, _coverage_pool = _coverage_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+@asynccontextmanager
+async def staged_upload(upload: UploadFile, suffix: str) -> AsyncIterator[Tuple[Union[str, bytes], str]]:
+    """
+    Make an upload readable by the shapefile service.
+    
+    The request body is already spooled by Starlette (in memory, rolling over to an
+    anonymous temporary file). Small uploads are passed on as bytes, so GDAL reads
+    them from memory; large ones are placed in the content-addressed upload store,
+    since GDAL needs a path with the right extension, and are reused from there when
+    the same file is uploaded again. Reading and hashing run in one worker-thread
+    call so neither blocks the event loop.
+    
+    Args:
+        upload: Uploaded file
+        suffix: Lower-cased file extension, used to check the content and name the stored file
+        
+    Yields:
+        Tuple of (the upload's contents or its stored file path, content hash)
+        
+    Raises:
+        HTTPException: If the upload is over MAX_UPLOAD_SIZE or its content does not match the extension
+    """
+    if upload.size is not None and upload.size > MAX_UPLOAD_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{upload.filename} exceeds the {settings.max_upload_size_mb} MB upload limit"
+        )
+    
+    if upload.size is not None and upload.size <= IN_MEMORY_UPLOAD_LIMIT:
+        yield await run_in_threadpool(read_upload, upload, suffix)
+        return
+    
+    yield await run_in_threadpool(save_upload_to_store, upload, suffix)
+
+
+async def stage_uploads(stack: AsyncExitStack,
+                        *uploads: Tuple[UploadFile, str]) -> List[Tuple[Union[str, bytes], str]]:
+    """
+    Stage several uploads concurrently with staged_upload.
+    
+    Args:
+        stack: Exit stack that owns the staged uploads and cleans them up
+        uploads: (upload, suffix) pairs
+        
+    Returns:
+        (source, content hash) tuples in the order of the uploads
+    """
+    # Let every upload finish staging before raising, so the stack cleans up all of them
+    results = await asyncio.gather(
+        *(stack.enter_async_context(staged_upload(upload, suffix)) for upload, suffix in uploads),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
 
 @router.post("/info", response_model=schemas.ShapefileInfo)
 async def get_shapefile_info(
@@ -27,36 +345,26 @@ async def get_shapefile_info(
     Returns:
         ShapefileInfo: Metadata about the shapefile including feature count, columns, and sample names
     """
-    if not shapefile.filename:
-        raise HTTPException(status_code=400, detail="No file provided")
-    
-    # Validate file extension
-    file_ext = Path(shapefile.filename).suffix.lower()
-    if file_ext not in {'.shp', '.geojson', '.gpkg'}:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Unsupported file format: {file_ext}. Supported formats: .shp, .geojson, .gpkg"
-        )
-    
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp_file:
-        content = await shapefile.read()
-        tmp_file.write(content)
-        tmp_file_path = tmp_file.name
+    file_ext = upload_suffix(shapefile, SHAPEFILE_EXTS, "shapefile")
     
-    try:
-        # Get shapefile information
-        info = shapefile_service.get_shapefile_info(tmp_file_path)
-        return schemas.ShapefileInfo(**info)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error processing shapefile: {str(e)}")
-    finally:
-        # Clean up temporary file
-        if os.path.exists(tmp_file_path):
-            os.unlink(tmp_file_path)
+    async with staged_upload(shapefile, file_ext) as (shapefile_source, shapefile_hash):
+        cache_key = (file_ext, shapefile_hash)
+        cached = _shapefile_info_cache.get(cache_key)
+        if cached is not None:
+            return json_response(cached)
+        
+        try:
+            # Get shapefile information
+            info = await run_in_threadpool(shapefile_service.get_shapefile_info, shapefile_source)
+            body = encode_model(schemas.ShapefileInfo(**info))
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Error processing shapefile: {str(e)}")
+        
+        _shapefile_info_cache[cache_key] = body
+        return json_response(body)
 
 
-@router.post("/validate-crs")
+@router.post("/validate-crs", response_model=schemas.CoordinateSystemValidation)
 async def validate_coordinate_systems(
     shapefile: UploadFile = File(..., description="Shapefile for city boundaries"),
     raster: UploadFile = File(..., description="Satellite imagery raster file")
@@ -67,44 +375,31 @@ async def validate_coordinate_systems(
     Returns:
         CoordinateSystemValidation: Validation results and recommendations
     """
-    if not shapefile.filename or not raster.filename:
-        raise HTTPException(status_code=400, detail="Both shapefile and raster files are required")
+    shapefile_ext = upload_suffix(shapefile, SHAPEFILE_EXTS, "shapefile")
+    raster_ext = upload_suffix(raster, RASTER_EXTS, "raster")
     
-    # Validate file extensions
-    shapefile_ext = Path(shapefile.filename).suffix.lower()
-    raster_ext = Path(raster.filename).suffix.lower()
-    
-    if shapefile_ext not in {'.shp', '.geojson', '.gpkg'}:
-        raise HTTPException(status_code=400, detail=f"Unsupported shapefile format: {shapefile_ext}")
-    
-    if raster_ext not in {'.tif', '.tiff', '.img', '.jp2'}:
-        raise HTTPException(status_code=400, detail=f"Unsupported raster format: {raster_ext}")
-    
-    # Save files temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=shapefile_ext) as shp_tmp:
-        shp_content = await shapefile.read()
-        shp_tmp.write(shp_content)
-        shp_tmp_path = shp_tmp.name
-    
-    with tempfile.NamedTemporaryFile(delete=False, suffix=raster_ext) as raster_tmp:
-        raster_content = await raster.read()
-        raster_tmp.write(raster_content)
-        raster_tmp_path = raster_tmp.name
-    
-    try:
-        # Validate coordinate systems
-        validation = shapefile_service.validate_coordinate_systems(shp_tmp_path, raster_tmp_path)
-        return schemas.CoordinateSystemValidation(**validation)
-    except Exception as e:
-        return schemas.CoordinateSystemValidation(
-            compatible=False,
-            error=f"Error validating coordinate systems: {str(e)}"
+    async with AsyncExitStack() as stack:
+        (shapefile_source, shapefile_hash), (raster_source, raster_hash) = await stage_uploads(
+            stack, (shapefile, shapefile_ext), (raster, raster_ext)
         )
-    finally:
-        # Clean up temporary files
-        for tmp_path in [shp_tmp_path, raster_tmp_path]:
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+        cache_key = (shapefile_ext, shapefile_hash, raster_ext, raster_hash)
+        cached = _crs_validation_cache.get(cache_key)
+        if cached is not None:
+            return json_response(cached)
+        
+        try:
+            # Validate coordinate systems
+            validation = await run_in_threadpool(
+                shapefile_service.validate_coordinate_systems, shapefile_source, raster_source
+            )
+            body = encode_model(schemas.CoordinateSystemValidation(**validation))
+            _crs_validation_cache[cache_key] = body
+            return json_response(body)
+        except Exception as e:
+            return json_response(encode_model(schemas.CoordinateSystemValidation(
+                compatible=False,
+                error=f"Error validating coordinate systems: {str(e)}"
+            )))
 
 
 @router.post("/calculate-green-coverage", response_model=schemas.GreenCoverageCalculationResponse)
@@ -129,166 +424,156 @@ async def calculate_green_coverage_from_satellite(
         GreenCoverageCalculationResponse: Detailed green coverage analysis results
     """
     try:
-        # Parse request data
-        request_params = json.loads(request_data)
-        calculation_request = schemas.GreenCoverageCalculationRequest(**request_params)
-    except json.JSONDecodeError as e:
-        raise HTTPException(status_code=400, detail=f"Invalid JSON in request_data: {str(e)}")
-    except Exception as e:
+        # Parse and validate request data in one pass, straight from the JSON string
+        calculation_request = schemas.GreenCoverageCalculationRequest.model_validate_json(request_data)
+    except ValidationError as e:
+        if any(error["type"] == "json_invalid" for error in e.errors()):
+            raise HTTPException(status_code=400, detail=f"Invalid JSON in request_data: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Invalid request parameters: {str(e)}")
     
-    if not shapefile.filename or not raster.filename:
-        raise HTTPException(status_code=400, detail="Both shapefile and raster files are required")
+    shapefile_ext = upload_suffix(shapefile, SHAPEFILE_EXTS, "shapefile")
+    raster_ext = upload_suffix(raster, RASTER_EXTS, "raster")
     
-    # Validate file extensions
-    shapefile_ext = Path(shapefile.filename).suffix.lower()
-    raster_ext = Path(raster.filename).suffix.lower()
-    
-    if shapefile_ext not in {'.shp', '.geojson', '.gpkg'}:
-        raise HTTPException(status_code=400, detail=f"Unsupported shapefile format: {shapefile_ext}")
-    
-    if raster_ext not in {'.tif', '.tiff', '.img', '.jp2'}:
-        raise HTTPException(status_code=400, detail=f"Unsupported raster format: {raster_ext}")
-    
-    # Save files temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=shapefile_ext) as shp_tmp:
-        shp_content = await shapefile.read()
-        shp_tmp.write(shp_content)
-        shp_tmp_path = shp_tmp.name
-    
-    with tempfile.NamedTemporaryFile(delete=False, suffix=raster_ext) as raster_tmp:
-        raster_content = await raster.read()
-        raster_tmp.write(raster_content)
-        raster_tmp_path = raster_tmp.name
-    
-    try:
-        # Initialize cache service
-        cache_service = CacheService(db)
-        
-        # Use cache service to get or calculate green coverage
-        def calculate_coverage():
-            return shapefile_service.calculate_green_coverage_from_files(
-                shapefile_path=shp_tmp_path,
-                raster_path=raster_tmp_path,
+    async with AsyncExitStack() as stack:
+        (shapefile_source, shapefile_hash), (raster_source, raster_hash) = await stage_uploads(
+            stack, (shapefile, shapefile_ext), (raster, raster_ext)
+        )
+        try:
+            # Initialize cache service
+            cache_service = CacheService(db)
+            
+            # Cache lookup runs in a worker thread; a miss computes in the coverage process pool
+            coverage_stats = await run_in_threadpool(
+                cache_service.get_or_calculate_satellite_coverage,
                 city_name=calculation_request.city_name,
                 ndvi_threshold=calculation_request.ndvi_threshold,
                 name_column=calculation_request.name_column,
                 red_band_idx=calculation_request.red_band_idx,
-                nir_band_idx=calculation_request.nir_band_idx
-            )
-        
-        coverage_stats = cache_service.get_or_calculate_satellite_coverage(
-            city_name=calculation_request.city_name,
-            ndvi_threshold=calculation_request.ndvi_threshold,
-            name_column=calculation_request.name_column,
-            red_band_idx=calculation_request.red_band_idx,
-            nir_band_idx=calculation_request.nir_band_idx,
-            year=calculation_request.year,
-            shapefile_path=shp_tmp_path,
-            raster_path=raster_tmp_path,
-            calculation_func=calculate_coverage
-        )
-        
-        # Add year from request
-        coverage_stats['year'] = calculation_request.year
-        
-        # Create response
-        response = schemas.GreenCoverageCalculationResponse(**coverage_stats)
-        
-        # Save to database if requested
-        if save_to_database:
-            background_tasks.add_task(
-                save_green_coverage_to_db,
-                coverage_stats=coverage_stats,
+                nir_band_idx=calculation_request.nir_band_idx,
                 year=calculation_request.year,
-                db_session=db
+                shapefile_path=shapefile_source,
+                raster_path=raster_source,
+                calculation_func=calculate_green_coverage_in_pool,
+                shapefile_content_hash=shapefile_hash,
+                raster_content_hash=raster_hash
             )
+            
+            # Add year from request
+            coverage_stats['year'] = calculation_request.year
+            
+            # Create response
+            response = json_response(encode_model(schemas.GreenCoverageCalculationResponse(**coverage_stats)))
+            
+            # Save to database if requested
+            if save_to_database:
+                background_tasks.add_task(
+                    save_green_coverage_to_db,
+                    coverage_stats=coverage_stats,
+                    year=calculation_request.year
+                )
+            
+            return response
+            
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error calculating green coverage: {str(e)}")
+
+
+def forget_city_id(city_name: str) -> None:
+    """
+    Drop a city from the id cache after it is renamed or deleted.
+    
+    Args:
+        city_name: Name of the city as it was cached
+    """
+    with _city_id_cache_lock:
+        _city_id_cache.pop(city_name.lower(), None)
+
+
+def resolve_city(db_session: Session, city_name: str, area_km2: Optional[float] = None) -> Tuple[int, str]:
+    """
+    Find a city by case-insensitive name, creating it if it does not exist.
+    
+    Args:
+        db_session: Database session
+        city_name: City name from the coverage results
+        area_km2: Area recorded on a newly created city
         
-        return response
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error calculating green coverage: {str(e)}")
-    finally:
-        # Clean up temporary files
-        for tmp_path in [shp_tmp_path, raster_tmp_path]:
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+    Returns:
+        (city id, stored city name)
+    """
+    key = city_name.lower()
+    with _city_id_cache_lock:
+        cached = _city_id_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    # Equality on lower(name) is served by ix_city_name_lower; ILIKE scanned the table
+    city = db_session.query(City).filter(func.lower(City.name) == func.lower(city_name)).first()
+    
+    if not city:
+        # Create new city if not found
+        city = City(
+            name=city_name,
+            country="Unknown",  # Would need to be provided or derived
+            area_km2=area_km2
+        )
+        db_session.add(city)
+        db_session.commit()
+        db_session.refresh(city)
+    
+    resolved = (city.id, city.name)
+    with _city_id_cache_lock:
+        _city_id_cache[key] = resolved
+    return resolved
 
 
-def save_green_coverage_to_db(coverage_stats: dict, year: int, db_session: Session):
+def save_green_coverage_to_db(coverage_stats: dict, year: int):
     """
     Background task to save green coverage results to database.
     
+    Runs after the response is sent, once the request's session has been closed,
+    so it opens a session of its own. FastAPI runs this sync task in its threadpool.
+    
     Args:
         coverage_stats: Results from green coverage calculation
         year: Year of the satellite imagery
-        db_session: Database session
     """
+    db_session = SessionLocal()
     try:
-        # Find or create city
-        city_name = coverage_stats['city_name']
-        city = db_session.query(City).filter(City.name.ilike(city_name)).first()
+        city_id, city_name = resolve_city(db_session, coverage_stats['city_name'], coverage_stats.get('total_area_km2'))
         
-        if not city:
-            # Create new city if not found
-            city = City(
-                name=city_name,
-                country="Unknown",  # Would need to be provided or derived
-                area_km2=coverage_stats.get('total_area_km2')
-            )
-            db_session.add(city)
-            db_session.commit()
-            db_session.refresh(city)
-        
-        # Check if coverage data already exists for this city and year
-        existing_coverage = db_session.query(GreenCoverage).filter(
-            GreenCoverage.city_id == city.id,
-            GreenCoverage.year == year
-        ).first()
-        
-        if existing_coverage:
-            # Update existing record
-            for key, value in coverage_stats.items():
-                if hasattr(existing_coverage, key) and key not in ['city_name', 'shapefile_path', 'raster_path']:
-                    setattr(existing_coverage, key, value)
-        else:
-            # Create new record
-            coverage_data = schemas.GreenCoverageEnhancedCreate(
-                city_id=city.id,
-                coverage_percentage=coverage_stats['green_coverage_percentage'],
-                year=year,
-                data_source=coverage_stats.get('data_source', 'Satellite Imagery Analysis'),
-                measurement_method=coverage_stats.get('measurement_method', 'NDVI-based analysis'),
-                total_area_km2=coverage_stats.get('total_area_km2'),
-                green_area_km2=coverage_stats.get('green_area_km2'),
-                ndvi_threshold=coverage_stats.get('ndvi_threshold'),
-                mean_ndvi=coverage_stats.get('mean_ndvi'),
-                std_ndvi=coverage_stats.get('std_ndvi'),
-                min_ndvi=coverage_stats.get('min_ndvi'),
-                max_ndvi=coverage_stats.get('max_ndvi'),
-                coordinate_system=coverage_stats.get('coordinate_system'),
-                total_pixels=coverage_stats.get('total_pixels'),
-                green_pixels=coverage_stats.get('green_pixels'),
-                processing_metadata=json.dumps({
-                    'shapefile_source': 'uploaded',
-                    'raster_source': 'uploaded',
-                    'processing_timestamp': str(coverage_stats.get('timestamp'))
-                })
-            )
-            
-            # Set city_name for the model
-            coverage_dict = coverage_data.dict()
-            coverage_dict['city_name'] = city.name
-            
-            db_coverage = GreenCoverage(**coverage_dict)
-            db_session.add(db_coverage)
+        values = {
+            'city_id': city_id,
+            'city_name': city_name,
+            'coverage_percentage': coverage_stats['green_coverage_percentage'],
+            'year': year,
+            'data_source': coverage_stats.get('data_source', 'Satellite Imagery Analysis'),
+            'measurement_method': coverage_stats.get('measurement_method', 'NDVI-based analysis'),
+            'processing_metadata': json.dumps({
+                'shapefile_source': 'uploaded',
+                'raster_source': 'uploaded',
+                'processing_timestamp': str(coverage_stats.get('timestamp'))
+            }),
+            **{column: coverage_stats.get(column) for column in COVERAGE_STAT_COLUMNS}
+        }
         
+        # Single INSERT ... ON CONFLICT statement against unique_city_year_coverage
+        # instead of a SELECT followed by an ORM insert or per-attribute update
+        update_values = {key: value for key, value in values.items() if key not in ('city_id', 'year')}
+        update_values['updated_at'] = func.now()
+        dialect_insert = postgresql_insert if db_session.get_bind().dialect.name == "postgresql" else sqlite_insert
+        statement = dialect_insert(GreenCoverage).values(**values).on_conflict_do_update(
+            index_elements=['city_id', 'year'],
+            set_=update_values
+        )
+        db_session.execute(statement)
         db_session.commit()
         
     except Exception as e:
         db_session.rollback()
-        # Log error (would typically use proper logging)
-        print(f"Error saving green coverage to database: {e}")
+        logger.exception("Error saving green coverage to database: %s", e)
+    finally:
+        db_session.close()
 
 
 @router.get("/supported-formats")
@@ -297,28 +582,6 @@ async def get_supported_formats():
     Get information about supported file formats.
     
     Returns:
-        Dictionary with supported shapefile and raster formats
-    """
-    return {
-        "shapefile_formats": {
-            ".shp": "ESRI Shapefile",
-            ".geojson": "GeoJSON",
-            ".gpkg": "GeoPackage"
-        },
-        "raster_formats": {
-            ".tif": "GeoTIFF",
-            ".tiff": "GeoTIFF",
-            ".img": "ERDAS IMAGINE",
-            ".jp2": "JPEG 2000"
-        },
-        "requirements": {
-            "shapefile": "Must contain city/administrative boundaries",
-            "raster": "Must be satellite imagery with Red and NIR bands for NDVI calculation",
-            "coordinate_systems": "Shapefile and raster should ideally use the same CRS"
-        },
-        "recommendations": {
-            "raster_resolution": "Higher resolution imagery (10m or better) provides more accurate results",
-            "band_order": "Typical band order: Red=Band 1, NIR=Band 2 (adjust indices accordingly)",
-            "ndvi_threshold": "0.3 is a common threshold for vegetation, but may need adjustment based on region"
-        }
-    }
\ No newline at end of file
+        JSON body with supported shapefile and raster formats, encoded once at import
+    """
+    return json_response(_SUPPORTED_FORMATS_JSON)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, ConfigDict, Field, EmailStr
 from typing import List, Optional
 from datetime import datetime
 
@@ -29,8 +29,7 @@ class User(UserBase):
     created_at: datetime
     last_login: Optional[datetime] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class UserInDB(User):
@@ -54,6 +53,10 @@ class TokenData(BaseModel):
     role: Optional[str] = None
 
 
+class UserLookupRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=500, description="User IDs to fetch")
+
+
 class PasswordChange(BaseModel):
     current_password: str = Field(..., description="Current password")
     new_password: str = Field(..., min_length=8, max_length=100, description="New password (min 8 characters)")
@@ -78,8 +81,7 @@ class CityCreate(CityBase):
 class City(CityBase):
     id: int
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Park schemas
@@ -103,8 +105,7 @@ class ParkCreate(ParkBase):
 class Park(ParkBase):
     id: int
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Green Coverage schemas
@@ -137,8 +138,7 @@ class GreenCoverage(GreenCoverageBase):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Shapefile-specific schemas
@@ -224,8 +224,7 @@ class NearestParkResponse(BaseModel):
     latitude: Optional[float]
     longitude: Optional[float]
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Green Coverage Comparison schemas
@@ -236,8 +235,7 @@ class GreenCoverageComparisonResponse(BaseModel):
     comparison_result: str = Field(..., description="Comparison result description")
     year: int = Field(..., description="Year of the green coverage data")
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Green Coverage Trend schemas
@@ -251,8 +249,7 @@ class GreenCoverageTrend(BaseModel):
     mean_ndvi: Optional[float] = Field(None, description="Mean NDVI value")
     created_at: Optional[datetime] = Field(None, description="When the data was created")
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Feedback schemas
@@ -271,13 +268,11 @@ class Feedback(FeedbackBase):
     created_at: datetime
     updated_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class FeedbackResponse(BaseModel):
     message: str = Field(..., description="Success message")
     feedback_id: int = Field(..., description="ID of the created feedback")
     
-    class Config:
-        from_attributes = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
@@ -1,8 +1,45 @@
+import csv
+import io
+
 from sqlalchemy.orm import Session
 from app.database import SessionLocal
 from app.models import City, Park, GreenCoverage
 
 
+def insert_rows(db: Session, model, rows: list) -> None:
+    """
+    Insert seed rows in bulk.
+    
+    On PostgreSQL the rows are streamed with COPY FROM STDIN as CSV (psycopg2),
+    avoiding per-row statement overhead; other databases use bulk_insert_mappings.
+    
+    Args:
+        db: Database session; the rows join its current transaction
+        model: Mapped class to insert into
+        rows: Column name -> value mappings
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        db.bulk_insert_mappings(model, rows)
+        return
+    
+    # Columns in declared order, limited to those the rows provide; None becomes NULL
+    columns = [column.name for column in model.__table__.columns if any(column.name in row for row in rows)]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row.get(column) for column in columns])
+    buffer.seek(0)
+    
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {model.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
 def seed_data():
     """Seed the database with sample data."""
     db: Session = SessionLocal()
@@ -57,14 +94,8 @@ def seed_data():
             }
         ]
         
-        # Create cities
-        cities = []
-        for city_data in cities_data:
-            city = City(**city_data)
-            db.add(city)
-            cities.append(city)
-        
-        db.commit()
+        # Create cities in bulk, skipping per-object unit-of-work bookkeeping
+        insert_rows(db, City, cities_data)
         
         # Sample parks
         parks_data = [
@@ -146,12 +177,8 @@ def seed_data():
             }
         ]
         
-        # Create parks
-        for park_data in parks_data:
-            park = Park(**park_data)
-            db.add(park)
-        
-        db.commit()
+        # Create parks (city_id values refer to the cities above)
+        insert_rows(db, Park, parks_data)
         
         # Sample green coverage data
         green_coverage_data = [
@@ -242,10 +269,9 @@ def seed_data():
         ]
         
         # Create green coverage records
-        for coverage_data in green_coverage_data:
-            coverage = GreenCoverage(**coverage_data)
-            db.add(coverage)
+        insert_rows(db, GreenCoverage, green_coverage_data)
         
+        # One commit for all three tables, so a failure leaves nothing half-seeded
         db.commit()
         print("Database seeded successfully with sample data!")
         
@@ -4,7 +4,8 @@ Authentication service for user management and login operations.
 
 from datetime import datetime
 from typing import Optional, Union
-from sqlalchemy.orm import Session
+from sqlalchemy import Row, select, bindparam
+from sqlalchemy.orm import Session, defer
 from fastapi import HTTPException, status
 
 from app.models.user import User, UserRole
@@ -12,6 +13,23 @@ from app.auth_utils import AuthUtils
 from app import schemas
 
 
+# Built once so SQLAlchemy's compiled-statement cache is hit on every auth lookup
+_GET_USER_BY_USERNAME = select(User).where(User.username == bindparam("username"))
+
+# Column-only lookup for request authentication; rows skip ORM object hydration
+_GET_USER_SNAPSHOT = select(
+    User.id, User.username, User.email, User.full_name, User.role,
+    User.is_active, User.created_at, User.last_login
+).where(User.username == bindparam("username"))
+
+
+def _invalidate_cached_user(username: str) -> None:
+    """Drop a user from the authentication cache after a change."""
+    # Imported lazily because auth_dependencies depends on this module
+    from app.auth_dependencies import invalidate_user
+    invalidate_user(username)
+
+
 class AuthService:
     """Service class for authentication operations."""
     
@@ -40,9 +58,14 @@ class AuthService:
         if not user.is_active:
             return None
         
-        if not AuthUtils.verify_password(password, user.hashed_password):
+        verified, new_hash = AuthUtils.verify_and_update_password(password, user.hashed_password)
+        if not verified:
             return None
         
+        # Migrate hashes created with a different bcrypt cost
+        if new_hash:
+            user.hashed_password = new_hash
+        
         # Update last login timestamp
         user.last_login = datetime.utcnow()
         self.db.commit()
@@ -86,7 +109,7 @@ class AuthService:
         
         # Validate role
         try:
-            role = UserRole(user_data.role)
+            role = UserRole(user_data.role).value
         except ValueError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -102,8 +125,7 @@ class AuthService:
             full_name=user_data.full_name,
             hashed_password=hashed_password,
             role=role,
-            is_active=True,
-            created_at=datetime.utcnow()
+            is_active=True
         )
         
         self.db.add(db_user)
@@ -134,7 +156,19 @@ class AuthService:
         Returns:
             User object if found, None otherwise
         """
-        return self.db.query(User).filter(User.username == username).first()
+        return self.db.execute(_GET_USER_BY_USERNAME, {"username": username}).scalar_one_or_none()
+    
+    def get_user_snapshot(self, username: str) -> Optional[Row]:
+        """
+        Get the public fields of a user by username without loading an ORM object.
+        
+        Args:
+            username: Username to search for
+            
+        Returns:
+            Row with the fields of schemas.User if found, None otherwise
+        """
+        return self.db.execute(_GET_USER_SNAPSHOT, {"username": username}).one_or_none()
     
     def get_user_by_email(self, email: str) -> Optional[User]:
         """
@@ -169,6 +203,8 @@ class AuthService:
                 detail="User not found"
             )
         
+        original_username = user.username
+        
         # Update fields if provided
         if user_data.username is not None:
             # Check if new username is already taken by another user
@@ -201,8 +237,7 @@ class AuthService:
         
         if user_data.role is not None:
             try:
-                role = UserRole(user_data.role)
-                user.role = role
+                user.role = UserRole(user_data.role).value
             except ValueError:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -215,6 +250,8 @@ class AuthService:
         self.db.commit()
         self.db.refresh(user)
         
+        _invalidate_cached_user(original_username)
+        
         return user
     
     def change_password(self, user_id: int, current_password: str, new_password: str) -> bool:
@@ -258,6 +295,8 @@ class AuthService:
         user.hashed_password = AuthUtils.get_password_hash(new_password)
         self.db.commit()
         
+        _invalidate_cached_user(user.username)
+        
         return True
     
     def deactivate_user(self, user_id: int) -> bool:
@@ -283,6 +322,8 @@ class AuthService:
         user.is_active = False
         self.db.commit()
         
+        _invalidate_cached_user(user.username)
+        
         return True
     
     def get_all_users(self, skip: int = 0, limit: int = 100) -> list[User]:
@@ -296,7 +337,27 @@ class AuthService:
         Returns:
             List of user objects
         """
-        return self.db.query(User).offset(skip).limit(limit).all()
+        # Ordered by id so pages are stable; the password hash is never listed, so leave it unloaded
+        stmt = select(User).options(defer(User.hashed_password)).order_by(User.id).offset(skip).limit(limit)
+        return self.db.scalars(stmt).all()
+    
+    def get_users_by_ids(self, user_ids: list[int]) -> list[User]:
+        """
+        Get several users in one query.
+        
+        Args:
+            user_ids: User database IDs; unknown IDs are skipped
+            
+        Returns:
+            List of user objects ordered by ID
+        """
+        stmt = (
+            select(User)
+            .options(defer(User.hashed_password))
+            .where(User.id.in_(set(user_ids)))
+            .order_by(User.id)
+        )
+        return self.db.scalars(stmt).all()
     
     def create_admin_user(self, username: str, email: str, password: str, full_name: str = None) -> User:
         """
@@ -312,7 +373,7 @@ class AuthService:
             Created admin user
         """
         # Check if admin user already exists
-        existing_admin = self.db.query(User).filter(User.role == UserRole.ADMIN).first()
+        existing_admin = self.db.query(User).filter(User.role == UserRole.ADMIN.value).first()
         if existing_admin:
             return existing_admin
         
@@ -8,6 +8,7 @@ import logging
 import os
 import tempfile
 import json
+import uuid
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional, Dict, List, Any
@@ -15,21 +16,43 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, delete, func, select, text, update
 
 from app.database import SessionLocal
-from app.models import City, GreenCoverage
+from app.models import BackgroundJob, City, GreenCoverage
 from app.services.shapefile_service import shapefile_service
 from app.services.cache_service import CacheService
+from app.services.upload_store import upload_store
 from app.config import settings
 from app.logging_config import (
     get_task_logger, log_background_task_start, log_background_task_end,
     log_satellite_processing, log_performance
 )
 
+try:
+    import fcntl
+except ImportError:  # Windows has no flock; only single-process servers run there
+    fcntl = None
+
 # Set up logging
 logger = get_task_logger('background_service')
 
+# Held by the one process (e.g. one Gunicorn worker) that runs the scheduler
+SCHEDULER_LOCK_FILE = "urban_api_scheduler.lock"
+
+# Number of finished manual update jobs kept for status polling
+MANUAL_JOB_HISTORY = 100
+
+# How often a queued job retries for a free slot, and a running job refreshes its heartbeat
+JOB_POLL_SECONDS = 5
+JOB_HEARTBEAT_SECONDS = 30
+
+# Queued or running jobs whose heartbeat is older than this were abandoned by a stopped process
+JOB_STALE_SECONDS = 3 * JOB_HEARTBEAT_SECONDS
+
+# PostgreSQL advisory lock key serializing job slot claims across processes
+JOB_SLOT_LOCK_KEY = 7301
+
 
 class BackgroundTaskService:
     """Service for managing background tasks and scheduled operations."""
@@ -37,10 +60,13 @@ class BackgroundTaskService:
     def __init__(self):
         self.scheduler: Optional[AsyncIOScheduler] = None
         self.is_running = False
+        self._lock_file = None
+        self._scheduler_run_id: Optional[int] = None
+        self._job_tasks = set()
         self.logger = get_task_logger('background_service')
         
         # Use configuration from settings
-        self.config = settings.get_processing_settings()
+        self.config = dict(settings.get_processing_settings())
         self.config.update({
             "satellite_data_dir": settings.satellite_data_dir,
             "shapefile_dir": settings.shapefile_dir,
@@ -58,7 +84,16 @@ class BackgroundTaskService:
             self.logger.info("Background tasks are disabled in configuration")
             return
         
-        self.scheduler = AsyncIOScheduler()
+        if not self._acquire_scheduler_lock():
+            self.logger.info("Scheduler is running in another worker process")
+            return
+        
+        # Bind to the running loop; never overlap runs of a job, and collapse a
+        # backlog of missed runs into a single catch-up run
+        self.scheduler = AsyncIOScheduler(
+            event_loop=asyncio.get_running_loop(),
+            job_defaults={"coalesce": True, "max_instances": 1}
+        )
         
         # Get schedule settings
         schedule = settings.get_cron_schedule()
@@ -73,24 +108,40 @@ class BackgroundTaskService:
             ),
             id="weekly_green_coverage_update",
             name="Weekly Green Coverage Update",
-            max_instances=1,
             misfire_grace_time=3600  # Allow 1 hour grace period
         )
         
-        # Add cache cleanup task
+        # Add cache cleanup task; frequent sweeps keep each batched purge small
         cache_settings = settings.get_cache_settings()
+        if cache_settings["cleanup_interval_minutes"] > 0:
+            self.scheduler.add_job(
+                self.cleanup_expired_cache,
+                trigger=IntervalTrigger(minutes=cache_settings["cleanup_interval_minutes"]),
+                id="cache_expiry_sweep",
+                name="Cache Expiry Sweep"
+            )
+        else:
+            self.scheduler.add_job(
+                self.cleanup_expired_cache,
+                trigger=CronTrigger(hour=cache_settings["cleanup_hour"], minute=0),
+                id="daily_cache_cleanup",
+                name="Daily Cache Cleanup"
+            )
+        
+        # Trim the upload store nightly, after the cache cleanup
         self.scheduler.add_job(
-            self.cleanup_expired_cache,
-            trigger=CronTrigger(hour=cache_settings["cleanup_hour"], minute=0),
-            id="daily_cache_cleanup",
-            name="Daily Cache Cleanup",
-            max_instances=1
+            self.evict_stored_uploads,
+            trigger=CronTrigger(hour=cache_settings["cleanup_hour"], minute=30),
+            id="nightly_upload_eviction",
+            name="Nightly Upload Store Eviction"
         )
         
         self.scheduler.start()
         self.is_running = True
         self.logger.info("Background task scheduler started")
-        log_background_task_start("scheduler", {"schedule": schedule, "cache_settings": cache_settings})
+        self._scheduler_run_id = log_background_task_start(
+            "scheduler", {"schedule": schedule, "cache_settings": cache_settings}
+        )
     
     async def stop_scheduler(self):
         """Stop the background task scheduler."""
@@ -99,8 +150,36 @@ class BackgroundTaskService:
         
         self.scheduler.shutdown()
         self.is_running = False
+        self._release_scheduler_lock()
         self.logger.info("Background task scheduler stopped")
-        log_background_task_end("scheduler", True, {"message": "Scheduler shutdown"})
+        log_background_task_end("scheduler", self._scheduler_run_id, True, {"message": "Scheduler shutdown"})
+    
+    def _acquire_scheduler_lock(self) -> bool:
+        """
+        Take the cross-process scheduler lock so multi-worker servers run each job once.
+        
+        Returns:
+            True if this process may run the scheduler, False if another process holds the lock
+        """
+        if fcntl is None:
+            return True
+        
+        lock_file = open(os.path.join(settings.temp_dir, SCHEDULER_LOCK_FILE), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        
+        # The lock is released when the file is closed or the process exits
+        self._lock_file = lock_file
+        return True
+    
+    def _release_scheduler_lock(self):
+        """Release the scheduler lock so a replacement worker can take over."""
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
     
     @log_performance
     async def update_green_coverage_weekly(self):
@@ -111,7 +190,7 @@ class BackgroundTaskService:
         start_time = datetime.now()
         task_name = "weekly_green_coverage_update"
         
-        log_background_task_start(task_name, {
+        run_id = log_background_task_start(task_name, {
             "scheduled_time": start_time.isoformat(),
             "config": self.config
         })
@@ -127,7 +206,7 @@ class BackgroundTaskService:
             
             if not cities:
                 self.logger.info("No cities require green coverage updates")
-                log_background_task_end(task_name, True, {"processed": 0, "message": "No updates needed"})
+                log_background_task_end(task_name, run_id, True, {"processed": 0, "message": "No updates needed"})
                 return
             
             # Process cities in batches
@@ -162,7 +241,7 @@ class BackgroundTaskService:
             duration = end_time - start_time
             
             success = total_errors == 0
-            log_background_task_end(task_name, success, {
+            log_background_task_end(task_name, run_id, success, {
                 "total_processed": total_processed,
                 "total_errors": total_errors,
                 "duration_seconds": duration.total_seconds(),
@@ -177,7 +256,7 @@ class BackgroundTaskService:
             
         except Exception as e:
             self.logger.error(f"Critical error in weekly green coverage update: {e}")
-            log_background_task_end(task_name, False, {"error": str(e)})
+            log_background_task_end(task_name, run_id, False, {"error": str(e)})
         finally:
             db.close()
     
@@ -196,14 +275,17 @@ class BackgroundTaskService:
         all_cities = db.query(City).all()
         cities_to_update = []
         
+        # Load this year's coverage for every city in one query instead of one per city
+        coverage_by_city = {}
+        current_coverage = db.query(GreenCoverage).filter(
+            GreenCoverage.year == current_year
+        ).order_by(GreenCoverage.id)
+        for coverage in current_coverage:
+            coverage_by_city.setdefault(coverage.city_id, coverage)
+        
         for city in all_cities:
             # Check if city has recent green coverage data
-            recent_coverage = db.query(GreenCoverage).filter(
-                and_(
-                    GreenCoverage.city_id == city.id,
-                    GreenCoverage.year == current_year
-                )
-            ).first()
+            recent_coverage = coverage_by_city.get(city.id)
             
             # Check if satellite data is available for this city
             has_satellite_data = await self._check_satellite_data_availability(city)
@@ -419,21 +501,35 @@ class BackgroundTaskService:
     async def cleanup_expired_cache(self):
         """Clean up expired cache entries."""
         task_name = "cache_cleanup"
-        log_background_task_start(task_name)
+        run_id = log_background_task_start(task_name)
         
         db = SessionLocal()
         try:
             cache_service = CacheService(db)
-            deleted_count = cache_service.cleanup_all_expired()
+            deleted_count = await asyncio.to_thread(cache_service.cleanup_all_expired)
             
-            log_background_task_end(task_name, True, {"deleted_entries": deleted_count})
+            log_background_task_end(task_name, run_id, True, {"deleted_entries": deleted_count})
             self.logger.info(f"Cleaned up {deleted_count} expired cache entries")
         except Exception as e:
-            log_background_task_end(task_name, False, {"error": str(e)})
+            log_background_task_end(task_name, run_id, False, {"error": str(e)})
             self.logger.error(f"Error during cache cleanup: {e}")
         finally:
             db.close()
     
+    async def evict_stored_uploads(self):
+        """Delete least recently used uploads until the upload store is under its size cap."""
+        task_name = "upload_eviction"
+        run_id = log_background_task_start(task_name)
+        
+        try:
+            deleted_count = await asyncio.to_thread(upload_store.evict)
+            
+            log_background_task_end(task_name, run_id, True, {"deleted_files": deleted_count})
+            self.logger.info(f"Evicted {deleted_count} stored uploads")
+        except Exception as e:
+            log_background_task_end(task_name, run_id, False, {"error": str(e)})
+            self.logger.error(f"Error during upload store eviction: {e}")
+    
     async def trigger_manual_update(self, city_name: Optional[str] = None) -> Dict[str, Any]:
         """
         Manually trigger green coverage update for all cities or a specific city.
@@ -447,7 +543,7 @@ class BackgroundTaskService:
         start_time = datetime.now()
         task_name = f"manual_update_{city_name or 'all_cities'}"
         
-        log_background_task_start(task_name, {
+        run_id = log_background_task_start(task_name, {
             "city_name": city_name,
             "triggered_at": start_time.isoformat()
         })
@@ -460,7 +556,9 @@ class BackgroundTaskService:
                 # Update specific city
                 city = db.query(City).filter(City.name.ilike(city_name)).first()
                 if not city:
-                    return {"error": f"City '{city_name}' not found"}
+                    error_result = {"error": f"City '{city_name}' not found"}
+                    log_background_task_end(task_name, run_id, False, error_result)
+                    return error_result
                 
                 cities = [city]
             else:
@@ -503,17 +601,228 @@ class BackgroundTaskService:
                 "results": results
             }
             
-            log_background_task_end(task_name, success, result)
+            log_background_task_end(task_name, run_id, success, result)
             return result
             
         except Exception as e:
             error_result = {"error": str(e)}
-            log_background_task_end(task_name, False, error_result)
+            log_background_task_end(task_name, run_id, False, error_result)
             self.logger.error(f"Error in manual update: {e}")
             return error_result
         finally:
             db.close()
     
+    async def enqueue_manual_update(self, city_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queue a manual green coverage update and return immediately.
+        
+        The job is recorded in the background_jobs table, so any worker process
+        can report its status. The update runs in a worker thread with its own
+        event loop, so its synchronous database and raster work never blocks
+        request handling. At most ``max_concurrent_updates`` jobs run at once
+        across all processes; the rest wait queued.
+        
+        Args:
+            city_name: Optional city name to update specifically
+            
+        Returns:
+            Job record with the job_id to poll via get_job_status
+        """
+        now = datetime.now()
+        job = BackgroundJob(
+            id=uuid.uuid4().hex,
+            city_name=city_name,
+            status="queued",
+            queued_at=now,
+            heartbeat_at=now
+        )
+        record = await asyncio.to_thread(self._insert_job, job)
+        
+        # Keep a reference so the task is not garbage collected while it runs
+        task = asyncio.create_task(self._run_manual_update_job(job.id, city_name))
+        self._job_tasks.add(task)
+        task.add_done_callback(self._job_tasks.discard)
+        
+        return record
+    
+    def _insert_job(self, job: BackgroundJob) -> Dict[str, Any]:
+        """Prune old jobs and store a newly queued one."""
+        db = SessionLocal()
+        try:
+            self._prune_jobs(db)
+            db.add(job)
+            db.commit()
+            return job.to_dict()
+        finally:
+            db.close()
+    
+    async def _run_manual_update_job(self, job_id: str, city_name: Optional[str]):
+        """Wait for a free slot, run a queued manual update and record its outcome on the job."""
+        try:
+            while True:
+                claimed = await asyncio.to_thread(self._claim_job_slot, job_id)
+                if claimed is None:
+                    # Marked abandoned by another process while waiting
+                    return
+                if claimed:
+                    break
+                await asyncio.sleep(JOB_POLL_SECONDS)
+            
+            update_task = asyncio.ensure_future(
+                asyncio.to_thread(asyncio.run, self.trigger_manual_update(city_name))
+            )
+            while not (await asyncio.wait({update_task}, timeout=JOB_HEARTBEAT_SECONDS))[0]:
+                await asyncio.to_thread(self._touch_job, job_id)
+            
+            result = update_task.result()
+            status = "failed" if "error" in result else "completed"
+        except Exception as e:
+            self.logger.error("Manual update job %s failed: %s", job_id, e)
+            status, result = "failed", {"error": str(e)}
+        
+        try:
+            await asyncio.to_thread(self._finish_job, job_id, status, result)
+        except Exception as e:
+            self.logger.error("Could not record the outcome of manual update job %s: %s", job_id, e)
+    
+    def _claim_job_slot(self, job_id: str) -> Optional[bool]:
+        """
+        Move a queued job to running if fewer than max_concurrent_updates jobs are running.
+        
+        Args:
+            job_id: Queued job to start
+            
+        Returns:
+            True if the job may start, False if it must keep waiting,
+            None if it is no longer queued
+        """
+        now = datetime.now()
+        running_jobs = (
+            select(func.count())
+            .select_from(BackgroundJob)
+            .where(
+                BackgroundJob.status == "running",
+                BackgroundJob.heartbeat_at >= now - timedelta(seconds=JOB_STALE_SECONDS)
+            )
+            .scalar_subquery()
+        )
+        
+        db = SessionLocal()
+        try:
+            if db.get_bind().dialect.name == "postgresql":
+                # Serialize slot claims; SQLite already serializes writers
+                db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": JOB_SLOT_LOCK_KEY})
+            
+            claimed = db.execute(
+                update(BackgroundJob)
+                .where(
+                    BackgroundJob.id == job_id,
+                    BackgroundJob.status == "queued",
+                    running_jobs < settings.max_concurrent_updates
+                )
+                .values(status="running", started_at=now, heartbeat_at=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            
+            waiting = 0
+            if not claimed:
+                # Still queued: refresh the heartbeat so the job is not swept as abandoned
+                waiting = db.execute(
+                    update(BackgroundJob)
+                    .where(BackgroundJob.id == job_id, BackgroundJob.status == "queued")
+                    .values(heartbeat_at=now)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+            db.commit()
+        finally:
+            db.close()
+        
+        if claimed:
+            return True
+        return False if waiting else None
+    
+    def _touch_job(self, job_id: str):
+        """Refresh a running job's heartbeat."""
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(BackgroundJob)
+                .where(BackgroundJob.id == job_id, BackgroundJob.status == "running")
+                .values(heartbeat_at=datetime.now())
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+    
+    def _finish_job(self, job_id: str, status: str, result: Dict[str, Any]):
+        """Record a job's final status and result."""
+        now = datetime.now()
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(BackgroundJob)
+                .where(BackgroundJob.id == job_id)
+                .values(status=status, result=result, finished_at=now, heartbeat_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+    
+    def _prune_jobs(self, db: Session):
+        """
+        Fail jobs abandoned by a stopped process, then forget the oldest
+        finished jobs beyond MANUAL_JOB_HISTORY.
+        
+        Queued and running jobs refresh their heartbeat while their process is
+        alive, so a stale heartbeat means the job will never finish.
+        """
+        now = datetime.now()
+        db.execute(
+            update(BackgroundJob)
+            .where(
+                BackgroundJob.status.in_(("queued", "running")),
+                BackgroundJob.heartbeat_at < now - timedelta(seconds=JOB_STALE_SECONDS)
+            )
+            .values(
+                status="failed",
+                finished_at=now,
+                result={"error": "Job abandoned: the process running it stopped"}
+            )
+            .execution_options(synchronize_session=False)
+        )
+        
+        finished = BackgroundJob.status.in_(("completed", "failed"))
+        newest_finished = (
+            select(BackgroundJob.id)
+            .where(finished)
+            .order_by(BackgroundJob.queued_at.desc())
+            .limit(MANUAL_JOB_HISTORY)
+        )
+        db.execute(
+            delete(BackgroundJob)
+            .where(finished, BackgroundJob.id.not_in(newest_finished))
+            .execution_options(synchronize_session=False)
+        )
+    
+    def get_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the status of a queued manual update job.
+        
+        Args:
+            job_id: Identifier returned by enqueue_manual_update
+            
+        Returns:
+            Job record, or None if the job is unknown or has been pruned
+        """
+        db = SessionLocal()
+        try:
+            job = db.get(BackgroundJob, job_id)
+            return job.to_dict() if job is not None else None
+        finally:
+            db.close()
+    
     def get_task_status(self) -> Dict[str, Any]:
         """Get current status of background tasks."""
         if not self.scheduler:
@@ -1,11 +1,85 @@
 import json
 import hashlib
+import threading
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Union
+from cachetools import TTLCache
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, bindparam, delete, or_, select
 
 from app.models.cache import CoverageCache
+from app.logging_config import cache_logger, log_cache_operation
+
+
+MEMORY_CACHE_MAX_ENTRIES = 1024
+# Invalidation in another process (a second API worker, or the scheduler purging entries
+# after an update) cannot evict this process's entries, so they are only trusted briefly:
+# long enough to absorb bursts of identical requests, short enough to bound staleness
+MEMORY_CACHE_TTL_SECONDS = 5  # upper bound; entries also expire with their DB row
+
+# Rows deleted per transaction when purging expired entries
+CLEANUP_BATCH_SIZE = 5000
+
+def upload_content_hash(data: bytes = b""):
+    """
+    Create the hasher used to key cached results on uploaded file contents.
+    
+    Args:
+        data: Initial bytes to hash
+        
+    Returns:
+        hashlib BLAKE2b object; feed further chunks with update()
+    """
+    return hashlib.blake2b(data, digest_size=16)
+
+
+# Cache-entry statements built once with bind parameters, so every lookup reuses
+# the same compiled statement from SQLAlchemy's cache
+_CACHE_KEY_MATCH = and_(
+    CoverageCache.cache_key == bindparam("cache_key"),
+    CoverageCache.calculation_type == bindparam("calculation_type")
+)
+# Only columns held by idx_cache_lookup_covering, so the lookup can stay in the index
+_GET_CACHED_RESULT = select(
+    CoverageCache.cached_data, CoverageCache.city_name, CoverageCache.expires_at
+).where(_CACHE_KEY_MATCH, CoverageCache.expires_at > bindparam("now")).limit(1)
+_GET_CACHE_ENTRY = select(CoverageCache).where(_CACHE_KEY_MATCH).limit(1)
+_DELETE_CACHE_ENTRY = delete(CoverageCache).where(_CACHE_KEY_MATCH)
+
+# Process-local tier in front of the coverage_cache table, shared by all CacheService
+# instances. Keyed by (cache_key, calculation_type); values are (data, city_name, expires_at).
+_memory_cache = TTLCache(maxsize=MEMORY_CACHE_MAX_ENTRIES, ttl=MEMORY_CACHE_TTL_SECONDS)
+_memory_cache_lock = threading.Lock()
+
+
+def _get_memory_cached(cache_key: str, calculation_type: str) -> Optional[Dict[str, Any]]:
+    """Return a cached result from the in-process tier if present and not expired."""
+    with _memory_cache_lock:
+        entry = _memory_cache.get((cache_key, calculation_type))
+    if entry is None or entry[2] <= time.time():
+        return None
+    return entry[0]
+
+
+def _set_memory_cached(cache_key: str, calculation_type: str, city_name: Optional[str],
+                       data: Dict[str, Any], expires_at: datetime) -> None:
+    """Store a result in the in-process tier until its DB expiry (or the tier TTL)."""
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)  # SQLite drops tzinfo
+    with _memory_cache_lock:
+        _memory_cache[(cache_key, calculation_type)] = (data, city_name, expires_at.timestamp())
+
+
+def _evict_memory_cached(city_name: Optional[str] = None, calculation_types: Optional[tuple] = None) -> None:
+    """Drop in-process entries for a city and/or calculation types."""
+    with _memory_cache_lock:
+        for key, (_, entry_city, _) in list(_memory_cache.items()):
+            if city_name is not None and entry_city != city_name:
+                continue
+            if calculation_types is not None and key[1] not in calculation_types:
+                continue
+            del _memory_cache[key]
 
 
 class CacheService:
@@ -37,28 +111,31 @@ class CacheService:
         if expired_count > 0:
             query.delete(synchronize_session=False)
             self.db.commit()
-            print(f"Cleaned up {expired_count} expired cache entries")
+            cache_logger.info("Cleaned up %s expired cache entries", expired_count)
     
     def get_cached_result(self, cache_key: str, calculation_type: str) -> Optional[Dict[str, Any]]:
         """Retrieve cached result if it exists and hasn't expired."""
-        now = datetime.now(timezone.utc)
+        cached = _get_memory_cached(cache_key, calculation_type)
+        if cached is not None:
+            return cached
         
-        cache_entry = self.db.query(CoverageCache).filter(
-            and_(
-                CoverageCache.cache_key == cache_key,
-                CoverageCache.calculation_type == calculation_type,
-                CoverageCache.expires_at > now
-            )
-        ).first()
+        key = {"cache_key": cache_key, "calculation_type": calculation_type}
+        try:
+            # cached_data is decoded by its JSON column type while the row is fetched
+            cache_entry = self.db.execute(
+                _GET_CACHED_RESULT, {**key, "now": datetime.now(timezone.utc)}
+            ).first()
+        except json.JSONDecodeError:
+            # If cached data is corrupted, remove the entry
+            self.db.rollback()
+            self.db.execute(_DELETE_CACHE_ENTRY, key, execution_options={"synchronize_session": False})
+            self.db.commit()
+            return None
         
         if cache_entry:
-            try:
-                return json.loads(cache_entry.cached_data)
-            except json.JSONDecodeError:
-                # If cached data is corrupted, remove the entry
-                self.db.delete(cache_entry)
-                self.db.commit()
-                return None
+            data = cache_entry.cached_data
+            _set_memory_cached(cache_key, calculation_type, cache_entry.city_name, data, cache_entry.expires_at)
+            return data
         
         return None
     
@@ -82,16 +159,13 @@ class CacheService:
         expires_at = now + timedelta(hours=expiration_hours)
         
         # Check if cache entry already exists
-        existing_entry = self.db.query(CoverageCache).filter(
-            and_(
-                CoverageCache.cache_key == cache_key,
-                CoverageCache.calculation_type == calculation_type
-            )
-        ).first()
+        existing_entry = self.db.execute(
+            _GET_CACHE_ENTRY, {"cache_key": cache_key, "calculation_type": calculation_type}
+        ).scalar_one_or_none()
         
         if existing_entry:
             # Update existing entry
-            existing_entry.cached_data = json.dumps(data)
+            existing_entry.cached_data = data
             existing_entry.expires_at = expires_at
             existing_entry.city_name = city_name
             existing_entry.city_id = city_id
@@ -101,13 +175,14 @@ class CacheService:
                 city_id=city_id,
                 city_name=city_name,
                 cache_key=cache_key,
-                cached_data=json.dumps(data),
+                cached_data=data,
                 expires_at=expires_at,
                 calculation_type=calculation_type
             )
             self.db.add(cache_entry)
         
         self.db.commit()
+        _set_memory_cached(cache_key, calculation_type, city_name, data, expires_at)
     
     def get_or_calculate_satellite_coverage(self,
                                           city_name: str,
@@ -116,10 +191,17 @@ class CacheService:
                                           red_band_idx: int,
                                           nir_band_idx: int,
                                           year: int,
-                                          shapefile_path: str,
-                                          raster_path: str,
-                                          calculation_func) -> Dict[str, Any]:
-        """Get satellite coverage from cache or calculate if not cached."""
+                                          shapefile_path: Union[str, bytes],
+                                          raster_path: Union[str, bytes],
+                                          calculation_func,
+                                          shapefile_content_hash: Optional[str] = None,
+                                          raster_content_hash: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get satellite coverage from cache or calculate if not cached.
+        
+        Content hashes computed while the files were received (see
+        upload_content_hash) key the cache without reading the files again.
+        """
         # Generate cache key from calculation parameters
         cache_params = {
             'city_name': city_name,
@@ -128,8 +210,8 @@ class CacheService:
             'red_band_idx': red_band_idx,
             'nir_band_idx': nir_band_idx,
             'year': year,
-            'shapefile_hash': self._get_file_hash(shapefile_path),
-            'raster_hash': self._get_file_hash(raster_path)
+            'shapefile_hash': shapefile_content_hash or self._get_file_hash(shapefile_path),
+            'raster_hash': raster_content_hash or self._get_file_hash(raster_path)
         }
         
         cache_key = self._generate_cache_key(**cache_params)
@@ -137,11 +219,11 @@ class CacheService:
         # Try to get from cache first
         cached_result = self.get_cached_result(cache_key, 'satellite')
         if cached_result:
-            print(f"Retrieved satellite coverage for {city_name} from cache")
+            log_cache_operation('hit', city_name, {'type': 'satellite'})
             return cached_result
         
         # Calculate if not in cache
-        print(f"Calculating satellite coverage for {city_name} (not in cache)")
+        log_cache_operation('miss', city_name, {'type': 'satellite'})
         result = calculation_func(
             shapefile_path=shapefile_path,
             raster_path=raster_path,
@@ -175,11 +257,11 @@ class CacheService:
         # Try to get from cache first
         cached_result = self.get_cached_result(cache_key, 'stats')
         if cached_result:
-            print(f"Retrieved city stats for {city_name} from cache")
+            log_cache_operation('hit', city_name, {'type': 'stats'})
             return cached_result
         
         # Calculate if not in cache
-        print(f"Calculating city stats for {city_name} (not in cache)")
+        log_cache_operation('miss', city_name, {'type': 'stats'})
         result = calculation_func()
         
         # Cache the result
@@ -201,11 +283,11 @@ class CacheService:
         # Try to get from cache first
         cached_result = self.get_cached_result(cache_key, 'stats')
         if cached_result:
-            print(f"Retrieved coverage comparison for {city_name} from cache")
+            log_cache_operation('hit', city_name, {'type': 'comparison'})
             return cached_result
         
         # Calculate if not in cache
-        print(f"Calculating coverage comparison for {city_name} (not in cache)")
+        log_cache_operation('miss', city_name, {'type': 'comparison'})
         result = calculation_func()
         
         # Cache the result
@@ -213,12 +295,14 @@ class CacheService:
         
         return result
     
-    def _get_file_hash(self, file_path: str) -> str:
-        """Generate hash of file contents for cache key."""
+    def _get_file_hash(self, file_path: Union[str, bytes]) -> str:
+        """Generate hash of file contents (or of in-memory upload bytes) for cache key."""
+        if isinstance(file_path, bytes):
+            return upload_content_hash(file_path).hexdigest()
         try:
             with open(file_path, 'rb') as f:
-                file_hash = hashlib.md5()
-                for chunk in iter(lambda: f.read(4096), b""):
+                file_hash = upload_content_hash()
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
                     file_hash.update(chunk)
                 return file_hash.hexdigest()
         except Exception:
@@ -235,8 +319,9 @@ class CacheService:
         deleted_count = query.count()
         query.delete(synchronize_session=False)
         self.db.commit()
+        _evict_memory_cached(city_name, (calculation_type,) if calculation_type else None)
         
-        print(f"Invalidated {deleted_count} cache entries for {city_name}")
+        cache_logger.info("Invalidated %s cache entries for %s", deleted_count, city_name)
     
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get statistics about the cache."""
@@ -261,18 +346,39 @@ class CacheService:
             'total_entries': total_entries,
             'valid_entries': valid_entries,
             'expired_entries': expired_entries,
-            'type_counts': type_counts
+            'type_counts': type_counts,
+            'memory_entries': len(_memory_cache)
         }
     
-    def cleanup_all_expired(self) -> int:
-        """Clean up all expired cache entries and return count of deleted entries."""
+    def cleanup_all_expired(self, batch_size: int = CLEANUP_BATCH_SIZE) -> int:
+        """
+        Clean up all expired cache entries in bounded batches.
+        
+        Each batch deletes at most batch_size rows found through the expires_at
+        index and commits, so a large backlog never holds one long write lock.
+        
+        Args:
+            batch_size: Maximum number of rows deleted per transaction
+            
+        Returns:
+            Number of deleted entries
+        """
         now = datetime.now(timezone.utc)
+        expired_ids = (
+            select(CoverageCache.id)
+            .where(CoverageCache.expires_at < now)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        purge = delete(CoverageCache).where(CoverageCache.id.in_(expired_ids))
         
-        expired_count = self.db.query(CoverageCache).filter(CoverageCache.expires_at < now).count()
-        self.db.query(CoverageCache).filter(CoverageCache.expires_at < now).delete(synchronize_session=False)
-        self.db.commit()
-        
-        return expired_count
+        expired_count = 0
+        while True:
+            deleted = self.db.execute(purge, execution_options={"synchronize_session": False}).rowcount
+            self.db.commit()
+            expired_count += deleted
+            if deleted < batch_size:
+                return expired_count
     
     def invalidate_all_coverage_cache(self):
         """Invalidate all coverage-related cache entries."""
@@ -286,8 +392,9 @@ class CacheService:
         deleted_count = query.count()
         query.delete(synchronize_session=False)
         self.db.commit()
+        _evict_memory_cached(calculation_types=('satellite', 'stats'))
         
-        print(f"Invalidated {deleted_count} coverage cache entries")
+        cache_logger.info("Invalidated %s coverage cache entries", deleted_count)
         return deleted_count
     
     def get_cached_cities(self) -> List[str]:
@@ -3,9 +3,12 @@ import rasterio
 import numpy as np
 from shapely.geometry import shape, Polygon, MultiPolygon
 from rasterio.features import geometry_mask
+from rasterio.io import MemoryFile
 from rasterio.warp import calculate_default_transform, reproject, Resampling
 from typing import Tuple, Optional, Dict, List, Union
+import io
 import tempfile
+from contextlib import contextmanager
 import os
 import logging
 from pathlib import Path
@@ -15,6 +18,13 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def describe_source(source: Union[str, Path, bytes]) -> str:
+    """Label a file source for result metadata without embedding raw upload bytes."""
+    if isinstance(source, bytes):
+        return "<in-memory upload>"
+    return str(source)
+
+
 class ShapefileService:
     """Service for handling shapefile operations and green coverage calculations."""
     
@@ -22,12 +32,12 @@ class ShapefileService:
         self.supported_extensions = {'.shp', '.geojson', '.gpkg'}
         self.supported_raster_extensions = {'.tif', '.tiff', '.img', '.jp2'}
     
-    def load_shapefile(self, file_path: str) -> gpd.GeoDataFrame:
+    def load_shapefile(self, file_path: Union[str, Path, bytes]) -> gpd.GeoDataFrame:
         """
         Load a shapefile or geospatial vector file.
         
         Args:
-            file_path: Path to the shapefile
+            file_path: Path to the shapefile, or the file's contents for an in-memory upload
             
         Returns:
             GeoDataFrame containing the shapefile data
@@ -36,16 +46,21 @@ class ShapefileService:
             FileNotFoundError: If file doesn't exist
             ValueError: If file format is not supported
         """
-        file_path = Path(file_path)
-        
-        if not file_path.exists():
-            raise FileNotFoundError(f"Shapefile not found: {file_path}")
-        
-        if file_path.suffix.lower() not in self.supported_extensions:
-            raise ValueError(f"Unsupported file format: {file_path.suffix}")
+        if isinstance(file_path, bytes):
+            # In-memory upload; the caller has already checked its format
+            source = io.BytesIO(file_path)
+        else:
+            file_path = Path(file_path)
+            
+            if not file_path.exists():
+                raise FileNotFoundError(f"Shapefile not found: {file_path}")
+            
+            if file_path.suffix.lower() not in self.supported_extensions:
+                raise ValueError(f"Unsupported file format: {file_path.suffix}")
+            source = file_path
         
         try:
-            gdf = gpd.read_file(file_path)
+            gdf = gpd.read_file(source)
             logger.info(f"Loaded shapefile with {len(gdf)} features")
             return gdf
         except Exception as e:
@@ -92,12 +107,12 @@ class ShapefileService:
         logger.info(f"Extracted polygon for city: {city_name}")
         return geometry
     
-    def load_raster_data(self, raster_path: str) -> Tuple[np.ndarray, dict]:
+    def load_raster_data(self, raster_path: Union[str, Path, bytes]) -> Tuple[np.ndarray, dict]:
         """
         Load raster data (satellite imagery).
         
         Args:
-            raster_path: Path to the raster file
+            raster_path: Path to the raster file, or the file's contents for an in-memory upload
             
         Returns:
             Tuple of (raster_array, raster_metadata)
@@ -106,16 +121,17 @@ class ShapefileService:
             FileNotFoundError: If raster file doesn't exist
             ValueError: If raster format is not supported
         """
-        raster_path = Path(raster_path)
-        
-        if not raster_path.exists():
-            raise FileNotFoundError(f"Raster file not found: {raster_path}")
-        
-        if raster_path.suffix.lower() not in self.supported_raster_extensions:
-            raise ValueError(f"Unsupported raster format: {raster_path.suffix}")
+        if not isinstance(raster_path, bytes):
+            raster_path = Path(raster_path)
+            
+            if not raster_path.exists():
+                raise FileNotFoundError(f"Raster file not found: {raster_path}")
+            
+            if raster_path.suffix.lower() not in self.supported_raster_extensions:
+                raise ValueError(f"Unsupported raster format: {raster_path.suffix}")
         
         try:
-            with rasterio.open(raster_path) as src:
+            with self._open_raster(raster_path) as src:
                 raster_data = src.read()
                 metadata = src.meta.copy()
                 
@@ -125,6 +141,16 @@ class ShapefileService:
             logger.error(f"Error loading raster: {e}")
             raise ValueError(f"Could not load raster: {e}")
     
+    @contextmanager
+    def _open_raster(self, raster_path: Union[Path, bytes]):
+        """Open a raster from disk, or from memory through GDAL's /vsimem/ filesystem."""
+        if isinstance(raster_path, bytes):
+            with MemoryFile(raster_path) as memfile, memfile.open() as src:
+                yield src
+        else:
+            with rasterio.open(raster_path) as src:
+                yield src
+    
     def calculate_ndvi(self, red_band: np.ndarray, nir_band: np.ndarray, 
                       nodata_value: float = -9999) -> np.ndarray:
         """
@@ -261,8 +287,8 @@ class ShapefileService:
             logger.error(f"Error calculating green coverage: {e}")
             raise ValueError(f"Could not calculate green coverage: {e}")
     
-    def calculate_green_coverage_from_files(self, shapefile_path: str, 
-                                          raster_path: str,
+    def calculate_green_coverage_from_files(self, shapefile_path: Union[str, Path, bytes], 
+                                          raster_path: Union[str, Path, bytes],
                                           city_name: str,
                                           ndvi_threshold: float = 0.3,
                                           name_column: str = 'NAME',
@@ -272,8 +298,8 @@ class ShapefileService:
         Complete workflow to calculate green coverage from shapefile and raster files.
         
         Args:
-            shapefile_path: Path to shapefile containing city boundaries
-            raster_path: Path to satellite imagery raster
+            shapefile_path: Path to (or contents of) shapefile containing city boundaries
+            raster_path: Path to (or contents of) satellite imagery raster
             city_name: Name of the city to analyze
             ndvi_threshold: NDVI threshold for vegetation classification
             name_column: Column containing city names in shapefile
@@ -300,8 +326,8 @@ class ShapefileService:
             # Add metadata
             coverage_stats.update({
                 'city_name': city_name,
-                'shapefile_path': str(shapefile_path),
-                'raster_path': str(raster_path),
+                'shapefile_path': describe_source(shapefile_path),
+                'raster_path': describe_source(raster_path),
                 'data_source': 'Satellite Imagery Analysis',
                 'measurement_method': f'NDVI-based analysis (threshold: {ndvi_threshold})',
                 'coordinate_system': raster_metadata.get('crs', 'Unknown')
@@ -313,12 +339,12 @@ class ShapefileService:
             logger.error(f"Error in green coverage workflow: {e}")
             raise
     
-    def get_shapefile_info(self, shapefile_path: str) -> Dict:
+    def get_shapefile_info(self, shapefile_path: Union[str, Path, bytes]) -> Dict:
         """
         Get information about a shapefile.
         
         Args:
-            shapefile_path: Path to the shapefile
+            shapefile_path: Path to the shapefile, or its contents
             
         Returns:
             Dictionary containing shapefile information
@@ -347,23 +373,48 @@ class ShapefileService:
             logger.error(f"Error getting shapefile info: {e}")
             raise
     
-    def validate_coordinate_systems(self, shapefile_path: str, raster_path: str) -> Dict:
+    def read_shapefile_crs(self, file_path: Union[str, Path, bytes]):
+        """
+        Read a vector file's CRS without loading all of its features.
+        
+        Args:
+            file_path: Path to the shapefile, or the file's contents for an in-memory upload
+            
+        Returns:
+            The file's pyproj CRS, or None if it has none
+        """
+        source = io.BytesIO(file_path) if isinstance(file_path, bytes) else file_path
+        return gpd.read_file(source, rows=1).crs
+    
+    def read_raster_crs(self, raster_path: Union[str, Path, bytes]):
+        """
+        Read a raster's CRS from its header without reading any bands.
+        
+        Args:
+            raster_path: Path to the raster, or the file's contents for an in-memory upload
+            
+        Returns:
+            The raster's rasterio CRS, or None if it has none
+        """
+        with self._open_raster(raster_path) as src:
+            return src.crs
+    
+    def validate_coordinate_systems(self, shapefile_path: Union[str, Path, bytes],
+                                    raster_path: Union[str, Path, bytes]) -> Dict:
         """
         Validate that shapefile and raster have compatible coordinate systems.
         
         Args:
-            shapefile_path: Path to shapefile
-            raster_path: Path to raster
+            shapefile_path: Path to shapefile, or its contents
+            raster_path: Path to raster, or its contents
             
         Returns:
             Dictionary with validation results
         """
         try:
-            gdf = self.load_shapefile(shapefile_path)
-            _, raster_meta = self.load_raster_data(raster_path)
-            
-            shapefile_crs = str(gdf.crs)
-            raster_crs = str(raster_meta.get('crs', 'Unknown'))
+            # Only the headers are needed: read one feature and no pixels
+            shapefile_crs = str(self.read_shapefile_crs(shapefile_path))
+            raster_crs = str(self.read_raster_crs(raster_path))
             
             compatible = shapefile_crs == raster_crs
             
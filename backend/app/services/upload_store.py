@@ -0,0 +1,182 @@
+"""
+Content-addressed store for uploaded shapefiles and rasters.
+Files are named by content hash, so re-uploading the same file reuses the stored copy.
+"""
+
+import os
+import shutil
+import threading
+import time
+import uuid
+import logging
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+
+from app.config import settings
+
+logger = logging.getLogger("urban_api.uploads")
+
+# Stored files used (or staged) within this window are never evicted, as a request may be reading them
+EVICTION_GRACE_SECONDS = 3600
+
+# Prefix of partially written files; they are renamed into place once complete
+TEMP_PREFIX = "tmp-"
+
+# Writes trigger an eviction pass once this long has passed since this process last evicted,
+# or once they add this fraction of the size cap, so the store stays bounded without a scheduler
+WRITE_EVICTION_INTERVAL_SECONDS = 600
+WRITE_EVICTION_FRACTION = 0.1
+
+
+class UploadStore:
+    """Directory of uploads named <content hash><extension>, capped at max_bytes."""
+    
+    def __init__(self, directory: Union[str, Path], max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._written_since_eviction = 0
+        self._last_eviction = time.monotonic()
+        self._eviction_lock = threading.Lock()
+    
+    def path_for(self, content_hash: str, suffix: str) -> Path:
+        """
+        Get the stored path for an upload.
+        
+        Args:
+            content_hash: Hex digest of the upload's contents
+            suffix: Lower-cased file extension, kept so GDAL can detect the format
+        
+        Returns:
+            Path of the stored file (which may not exist yet)
+        """
+        return self.directory / f"{content_hash}{suffix}"
+    
+    def reuse(self, path: Path) -> bool:
+        """
+        Mark a stored file as recently used, if it exists.
+        
+        Args:
+            path: Stored file path from path_for
+        
+        Returns:
+            True if the file is already stored
+        """
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+    
+    def write(self, path: Path, source: BinaryIO, chunk_size: int = 1024 * 1024) -> None:
+        """
+        Copy a file into the store under the given path.
+        
+        The copy is written to a temporary name and renamed into place, so readers
+        never see a partial file and concurrent uploads of the same content are safe.
+        Every so often a write also runs an eviction pass (see evict_if_due).
+        
+        Args:
+            path: Stored file path from path_for
+            source: Readable binary file positioned at the start of the content
+            chunk_size: Copy buffer size in bytes
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.directory / f"{TEMP_PREFIX}{uuid.uuid4().hex}"
+        try:
+            with open(tmp_path, "wb") as tmp_file:
+                shutil.copyfileobj(source, tmp_file, chunk_size)
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        
+        self.evict_if_due(path.stat().st_size)
+    
+    def evict_if_due(self, written_bytes: int = 0) -> int:
+        """
+        Run an eviction pass if enough time or data has passed since the last one.
+        
+        Args:
+            written_bytes: Bytes just added to the store
+        
+        Returns:
+            Number of files deleted (0 if no pass was due)
+        """
+        with self._eviction_lock:
+            self._written_since_eviction += written_bytes
+            due = (
+                time.monotonic() - self._last_eviction >= WRITE_EVICTION_INTERVAL_SECONDS
+                or self._written_since_eviction >= self.max_bytes * WRITE_EVICTION_FRACTION
+            )
+            if not due:
+                return 0
+            self._written_since_eviction = 0
+            self._last_eviction = time.monotonic()
+        
+        try:
+            return self.evict()
+        except OSError as e:
+            logger.warning("Upload store eviction failed: %s", e)
+            return 0
+    
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """
+        Delete least recently used files until the store fits in max_bytes.
+        
+        Files used within EVICTION_GRACE_SECONDS are kept even if the store stays
+        over its cap; abandoned partial writes older than that are always removed.
+        
+        Args:
+            max_bytes: Size cap for the store (defaults to the store's own cap)
+        
+        Returns:
+            Number of files deleted
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        cutoff = time.time() - EVICTION_GRACE_SECONDS
+        entries = []
+        deleted = 0
+        
+        try:
+            scan = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return 0
+        
+        for entry in scan:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.name.startswith(TEMP_PREFIX):
+                if stat.st_mtime < cutoff:
+                    deleted += self._remove(entry.path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        
+        total = sum(size for _, size, _ in entries)
+        # Oldest first: mtime is refreshed on every reuse
+        for mtime, size, path in sorted(entries):
+            if total <= max_bytes or mtime >= cutoff:
+                break
+            if self._remove(path):
+                total -= size
+                deleted += 1
+        
+        return deleted
+    
+    @staticmethod
+    def _remove(path: str) -> int:
+        """Delete a file, tolerating a concurrent removal; returns 1 if it was deleted."""
+        try:
+            os.unlink(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
+            logger.warning("Could not remove stored upload %s: %s", path, e)
+            return 0
+
+
+# Global instance
+upload_store = UploadStore(settings.upload_store_dir, settings.upload_store_max_mb * 1024 * 1024)
@@ -0,0 +1,47 @@
+"""
+Gunicorn configuration for running the API with Uvicorn workers.
+
+Run from the backend directory:
+    gunicorn -c gunicorn_conf.py app.main:app
+"""
+
+import os
+import sys
+
+# Add the backend directory to Python path so the app settings can be imported
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from uvicorn.workers import UvicornWorker
+
+from app.config import settings
+
+
+class UvloopWorker(UvicornWorker):
+    """Uvicorn worker pinned to uvloop and httptools, rather than silently falling back to asyncio/h11."""
+    CONFIG_KWARGS = {**UvicornWorker.CONFIG_KWARGS, "loop": "uvloop", "http": "httptools"}
+
+
+bind = f"{settings.api_host}:{settings.api_port}"
+workers = settings.api_workers
+worker_class = "gunicorn_conf.UvloopWorker"
+loglevel = settings.log_level.lower()
+
+# Import the app once in the master so workers share its modules copy-on-write
+preload_app = True
+
+
+def when_ready(server):
+    """Warn when the scheduler endpoints would only see one of several workers."""
+    if workers > 1 and settings.enable_background_tasks and settings.scheduler_in_api:
+        server.log.warning(
+            "API_WORKERS=%d with SCHEDULER_IN_API=true: the scheduler runs in one worker only, "
+            "so /background-tasks/status, /start and /stop depend on which worker answers. "
+            "Set SCHEDULER_IN_API=false and run scheduler_main.py instead.",
+            workers
+        )
+
+
+def post_fork(server, worker):
+    """Drop database connections inherited from the master; each worker opens its own."""
+    from app.database import engine
+    engine.dispose(close=False)
@@ -4,19 +4,43 @@ Run this script after installing the new dependencies.
 """
 
 import sys
+import warnings
 from pathlib import Path
 
 # Add the backend directory to the Python path
 backend_dir = Path(__file__).parent
 sys.path.insert(0, str(backend_dir))
 
-from sqlalchemy import text
-from app.database import engine, get_db
+from sqlalchemy import text, inspect
+from sqlalchemy.exc import SAWarning
+from sqlalchemy.schema import CreateIndex
+from app.database import engine, get_db, Base
+import app.models  # noqa: F401 - registers all tables on Base.metadata
+from app.models.park import PARKS_RTREE_DDL
+from app.models.user import User
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Indexes replaced by newer model indexes, dropped by create_missing_indexes
+SUPERSEDED_INDEXES = {
+    "coverage_cache": (
+        "idx_cache_lookup",  # replaced by idx_cache_lookup_covering
+        # Single-column indexes covered by the composite lookup indexes or never queried
+        "ix_coverage_cache_cache_key",
+        "ix_coverage_cache_calculation_type",
+        "ix_coverage_cache_city_name",
+        "ix_coverage_cache_city_id",
+        "ix_coverage_cache_created_at",
+        "idx_city_id_cache",
+        "idx_created_at_cache",
+    ),
+    "users": (
+        "idx_user_auth_lookup",  # redundant with the unique username index
+    ),
+}
+
 
 def migrate_green_coverage_table():
     """Migrate the green_coverage table to include new fields."""
@@ -119,17 +143,14 @@ def create_cache_table():
         calculation_type VARCHAR(50) NOT NULL
     );
     
-    CREATE INDEX IF NOT EXISTS idx_cache_lookup 
+    CREATE INDEX IF NOT EXISTS idx_cache_lookup_covering 
     ON coverage_cache(cache_key, calculation_type, expires_at);
     
     CREATE INDEX IF NOT EXISTS idx_city_cache 
     ON coverage_cache(city_name, calculation_type, expires_at);
     
-    CREATE INDEX IF NOT EXISTS idx_city_id_cache 
-    ON coverage_cache(city_id);
-    
-    CREATE INDEX IF NOT EXISTS idx_created_at_cache 
-    ON coverage_cache(created_at);
+    CREATE INDEX IF NOT EXISTS ix_coverage_cache_expires_at 
+    ON coverage_cache(expires_at);
     """
     
     try:
@@ -159,6 +180,209 @@ def create_cache_table():
         return False
 
 
+def create_missing_tables():
+    """Create model tables that do not exist yet (e.g. background_jobs), with their indexes."""
+    try:
+        inspector = inspect(engine)
+        missing = [table for table in Base.metadata.sorted_tables if not inspector.has_table(table.name)]
+        
+        if not missing:
+            logger.info("All model tables already exist.")
+            return True
+        
+        Base.metadata.create_all(bind=engine, tables=missing)
+        logger.info(f"Created tables: {[table.name for table in missing]}")
+        return True
+        
+    except Exception as e:
+        logger.error(f"Table creation failed: {e}")
+        return False
+
+
+def create_missing_indexes():
+    """Create indexes declared on the models that are missing from existing tables, and drop superseded ones."""
+    try:
+        created = []
+        dropped = []
+        
+        if engine.dialect.name == "postgresql":
+            # idx_cache_lookup_covering used to INCLUDE cached_data, which fails inserts of
+            # payloads over the btree row size limit; drop it so it is recreated without it
+            with engine.begin() as connection:
+                outdated = connection.execute(text(
+                    "SELECT 1 FROM pg_indexes WHERE schemaname = current_schema() "
+                    "AND indexname = 'idx_cache_lookup_covering' AND indexdef LIKE '%cached_data%'"
+                )).first()
+                if outdated:
+                    connection.execute(text("DROP INDEX idx_cache_lookup_covering"))
+                    dropped.append("idx_cache_lookup_covering")
+        
+        inspector = inspect(engine)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            
+            with warnings.catch_warnings():
+                # Expression indexes (e.g. lower(name)) are not reflected; IF NOT EXISTS covers them
+                warnings.simplefilter("ignore", SAWarning)
+                existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    with engine.begin() as connection:
+                        connection.execute(CreateIndex(index, if_not_exists=True))
+                    created.append(index.name)
+            
+            for index_name in SUPERSEDED_INDEXES.get(table.name, ()):
+                if index_name in existing_indexes:
+                    with engine.begin() as connection:
+                        connection.execute(text(f"DROP INDEX {index_name}"))
+                    dropped.append(index_name)
+        
+        if created:
+            logger.info(f"Created indexes: {created}")
+        else:
+            logger.info("All model indexes already exist.")
+        if dropped:
+            logger.info(f"Dropped superseded indexes: {dropped}")
+        return True
+        
+    except Exception as e:
+        logger.error(f"Index creation failed: {e}")
+        return False
+
+
+def create_parks_spatial_index():
+    """Create the SQLite R*Tree index (and sync triggers) for park coordinates."""
+    if engine.dialect.name != "sqlite":
+        logger.info("Parks spatial index is SQLite-only; skipping.")
+        return True
+    
+    try:
+        with engine.begin() as connection:
+            for statement in PARKS_RTREE_DDL:
+                connection.execute(text(statement))
+        logger.info("Parks spatial index is up to date.")
+        return True
+        
+    except Exception as e:
+        logger.error(f"Parks spatial index creation failed: {e}")
+        return False
+
+
+def normalize_user_roles():
+    """
+    Rewrite user roles stored as enum names ('ADMIN') to their values ('admin').
+    
+    On PostgreSQL the column was created with the native userrole enum type,
+    so it is first converted to a plain string column (lower-casing in the
+    same step) and the enum type is dropped.
+    """
+    try:
+        with engine.begin() as connection:
+            if not inspect(connection).has_table("users"):
+                logger.info("Users table does not exist yet; skipping role normalization.")
+                return True
+            
+            if engine.dialect.name == "postgresql":
+                role_type = connection.execute(text(
+                    "SELECT udt_name FROM information_schema.columns "
+                    "WHERE table_schema = current_schema() AND table_name = 'users' AND column_name = 'role'"
+                )).scalar()
+                if role_type == "userrole":
+                    connection.execute(text(
+                        "ALTER TABLE users ALTER COLUMN role TYPE varchar(16) USING lower(role::text)"
+                    ))
+                    connection.execute(text("DROP TYPE IF EXISTS userrole"))
+                    logger.info("Converted users.role from the userrole enum to varchar(16).")
+            
+            result = connection.execute(text(
+                "UPDATE users SET role = lower(role) WHERE role IN ('ADMIN', 'VIEWER')"
+            ))
+        logger.info(f"Normalized {result.rowcount} user role(s).")
+        return True
+        
+    except Exception as e:
+        logger.error(f"User role normalization failed: {e}")
+        return False
+
+
+def rebuild_users_table():
+    """
+    Rebuild the users table so created_at gets its server-side default.
+    
+    SQLite cannot alter a column default in place, so the table is recreated
+    from the model (which also adds the role CHECK constraint) and the rows
+    are copied across. PostgreSQL alters the existing table instead.
+    Run after normalize_user_roles.
+    """
+    if engine.dialect.name == "postgresql":
+        return alter_users_table_postgresql()
+    if engine.dialect.name != "sqlite":
+        logger.info(f"Users table rebuild is not supported on {engine.dialect.name}; skipping.")
+        return True
+    
+    try:
+        with engine.begin() as connection:
+            if not inspect(connection).has_table("users"):
+                logger.info("Users table does not exist yet; skipping rebuild.")
+                return True
+            
+            columns = connection.execute(text("PRAGMA table_info(users);")).fetchall()
+            created_at = next((row for row in columns if row[1] == "created_at"), None)
+            if created_at is not None and created_at[4] is not None:
+                logger.info("Users table is up to date.")
+                return True
+            
+            column_names = ", ".join(row[1] for row in columns)
+            connection.execute(text("ALTER TABLE users RENAME TO users_old"))
+            # Indexes follow the renamed table; drop them so the new table can reuse the names
+            old_indexes = connection.execute(text(
+                "SELECT name FROM sqlite_master "
+                "WHERE type = 'index' AND tbl_name = 'users_old' AND sql IS NOT NULL"
+            )).scalars().all()
+            for index_name in old_indexes:
+                connection.execute(text(f'DROP INDEX "{index_name}"'))
+            
+            User.__table__.create(connection)
+            connection.execute(text(
+                f"INSERT INTO users ({column_names}) SELECT {column_names} FROM users_old"
+            ))
+            connection.execute(text("DROP TABLE users_old"))
+        logger.info("Rebuilt users table with server-side created_at default.")
+        return True
+        
+    except Exception as e:
+        logger.error(f"Users table rebuild failed: {e}")
+        return False
+
+
+def alter_users_table_postgresql():
+    """Add the server-side defaults and the role CHECK constraint to an existing PostgreSQL users table."""
+    try:
+        with engine.begin() as connection:
+            if not inspect(connection).has_table("users"):
+                logger.info("Users table does not exist yet; skipping alteration.")
+                return True
+            
+            connection.execute(text("ALTER TABLE users ALTER COLUMN created_at SET DEFAULT now()"))
+            connection.execute(text("ALTER TABLE users ALTER COLUMN role SET DEFAULT 'viewer'"))
+            
+            has_check = connection.execute(text(
+                "SELECT 1 FROM pg_constraint "
+                "WHERE conname = 'ck_users_role' AND conrelid = 'users'::regclass"
+            )).first() is not None
+            if not has_check:
+                connection.execute(text(
+                    "ALTER TABLE users ADD CONSTRAINT ck_users_role CHECK (role IN ('admin', 'viewer'))"
+                ))
+        logger.info("Users table has server-side defaults and the role check constraint.")
+        return True
+        
+    except Exception as e:
+        logger.error(f"Users table alteration failed: {e}")
+        return False
+
+
 def verify_migration():
     """Verify that the migration was successful."""
     try:
@@ -230,10 +454,27 @@ if __name__ == "__main__":
     print("\n2. Creating cache table...")
     cache_creation_success = create_cache_table()
     
-    if coverage_migration_success and cache_creation_success:
+    print("\n3. Creating missing tables...")
+    table_creation_success = create_missing_tables()
+    
+    print("\n4. Creating missing indexes...")
+    index_creation_success = create_missing_indexes()
+    
+    print("\n5. Creating parks spatial index...")
+    spatial_index_success = create_parks_spatial_index()
+    
+    print("\n6. Normalizing user roles...")
+    role_normalization_success = normalize_user_roles()
+    
+    print("\n7. Rebuilding users table...")
+    users_rebuild_success = role_normalization_success and rebuild_users_table()
+    
+    if (coverage_migration_success and cache_creation_success and table_creation_success
+            and index_creation_success and spatial_index_success
+            and role_normalization_success and users_rebuild_success):
         print("\n✓ All database migrations completed successfully!")
         
-        print("\n3. Verifying migration...")
+        print("\n8. Verifying migration...")
         if verify_migration():
             print("✓ Migration verification successful!")
             
@@ -259,4 +500,14 @@ if __name__ == "__main__":
             print("  - Green coverage table migration failed")
         if not cache_creation_success:
             print("  - Cache table creation failed")
+        if not table_creation_success:
+            print("  - Table creation failed")
+        if not index_creation_success:
+            print("  - Index creation failed")
+        if not spatial_index_success:
+            print("  - Parks spatial index creation failed")
+        if not role_normalization_success:
+            print("  - User role normalization failed")
+        if not users_rebuild_success:
+            print("  - Users table rebuild failed")
         sys.exit(1)
\ No newline at end of file
@@ -21,4 +21,4 @@ if __name__ == "__main__":
     print("🔄 Starting server...")
     
     # Run the server
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="127.0.0.1", port=8000, loop="auto", http="auto")
\ No newline at end of file
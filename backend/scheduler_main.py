@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Run the background task scheduler as its own process, so scheduled jobs never
+compete with API requests for a server event loop.
+
+Set SCHEDULER_IN_API=false for the API servers, then run from the backend directory:
+    python scheduler_main.py
+"""
+
+import asyncio
+import os
+import signal
+import sys
+
+# Add the backend directory to Python path so the app package can be imported
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.logging_config import setup_logging, flush_task_events, api_logger
+from app.services.background_tasks import background_task_service
+
+
+async def main() -> int:
+    """Run the scheduler until SIGINT/SIGTERM."""
+    setup_logging()
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows; Ctrl+C still raises KeyboardInterrupt
+            pass
+    
+    await background_task_service.start_scheduler()
+    if not background_task_service.is_running:
+        api_logger.error("Scheduler not started: background tasks are disabled or already running")
+        return 1
+    
+    api_logger.info("Background task scheduler process started")
+    try:
+        await stop.wait()
+    finally:
+        await background_task_service.stop_scheduler()
+        flush_task_events()
+        api_logger.info("Background task scheduler process stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test script for JWT and password helpers in app.auth_utils
+"""
+
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import timedelta
+
+from fastapi import HTTPException
+
+from app import auth_utils
+from app.auth_utils import AuthUtils
+
+
+def test_verify_token_uses_cache():
+    """Test that a verified token is served from the cache on repeat calls."""
+    token, _ = AuthUtils.create_token_for_user(1, "cache_user", "viewer")
+
+    first = AuthUtils.verify_token(token)
+    second = AuthUtils.verify_token(token)
+
+    assert first["sub"] == "cache_user"
+    assert second is first
+    assert auth_utils._get_cached_payload(token) is first
+    assert not AuthUtils.is_token_expired(token)
+    print("✓ Verified token payload reused from cache")
+
+
+def test_cache_entry_bounded_by_exp():
+    """Test that cache entries never outlive the token's exp claim."""
+    token = AuthUtils.create_access_token({"sub": "short_lived"}, timedelta(seconds=30))
+    payload = AuthUtils.verify_token(token)
+
+    _, valid_until = auth_utils._token_cache[auth_utils._token_cache_key(token)]
+    assert valid_until <= payload["exp"]
+    print("✓ Cache entry expiry bounded by token exp")
+
+
+def test_invalid_token_not_cached():
+    """Test that invalid tokens raise and are never cached."""
+    token = "not.a.token"
+
+    try:
+        AuthUtils.verify_token(token)
+        assert False, "Invalid token should raise"
+    except HTTPException as e:
+        assert e.status_code == 401
+
+    assert auth_utils._get_cached_payload(token) is None
+    assert AuthUtils.is_token_expired(token)
+    print("✓ Invalid token rejected and not cached")
+
+
+def test_password_hash_upgraded_on_verify():
+    """Test that weaker bcrypt hashes are re-hashed and stronger ones are kept."""
+    from passlib.hash import bcrypt
+
+    old_hash = bcrypt.using(rounds=auth_utils.BCRYPT_ROUNDS - 1).hash("Str0ng!pass")
+    verified, new_hash = AuthUtils.verify_and_update_password("Str0ng!pass", old_hash)
+    assert verified
+    assert new_hash is not None and f"${auth_utils.BCRYPT_ROUNDS:02d}$" in new_hash
+
+    strong_hash = bcrypt.using(rounds=auth_utils.BCRYPT_ROUNDS + 1).hash("Str0ng!pass")
+    verified, new_hash = AuthUtils.verify_and_update_password("Str0ng!pass", strong_hash)
+    assert verified and new_hash is None
+
+    verified, new_hash = AuthUtils.verify_and_update_password("Str0ng!pass", AuthUtils.get_password_hash("Str0ng!pass"))
+    assert verified and new_hash is None
+    print("✓ Outdated bcrypt hashes upgraded on verify")
+
+
+def test_validate_password_strength():
+    """Test password strength rules for each character class."""
+    assert AuthUtils.validate_password_strength("Str0ng!pass") == []
+
+    errors = AuthUtils.validate_password_strength("short")
+    assert "Password must be at least 8 characters long" in errors
+    assert "Password must contain at least one uppercase letter" in errors
+    assert "Password must contain at least one number" in errors
+    assert "Password must contain at least one special character" in errors
+    assert "Password must contain at least one lowercase letter" not in errors
+
+    assert AuthUtils.validate_password_strength("ALLUPPER1!") == [
+        "Password must contain at least one lowercase letter"
+    ]
+    # Non-ASCII passwords take the per-character path
+    assert AuthUtils.validate_password_strength("ÉCOLEvert9!") == []
+    assert auth_utils._scan_password("Str0ng!pass") == auth_utils._HAS_ALL
+    print("✓ Password strength rules enforced")
+
+
+def test_expiry_check_reuses_payload():
+    """Test that a verified payload answers the expiry check without decoding."""
+    token, _ = AuthUtils.create_token_for_user(2, "expiry_user", "viewer")
+    payload, exp = AuthUtils.verify_token_with_expiry(token)
+
+    assert exp == payload["exp"]
+    assert not AuthUtils.is_token_expired(token, payload)
+    assert AuthUtils.is_token_expired(token, {"sub": "expiry_user", "exp": 0})
+    assert AuthUtils.is_token_expired(token, {"sub": "expiry_user"})
+    print("✓ Expiry check reuses verified payload")
+
+
+def test_fast_expiry_check():
+    """Test the signature-free expiry pre-check."""
+    token, _ = AuthUtils.create_token_for_user(3, "fast_user", "viewer")
+    assert not AuthUtils.is_token_expired_fast(token)
+
+    expired = AuthUtils.create_access_token({"sub": "fast_user"}, timedelta(seconds=-10))
+    assert AuthUtils.is_token_expired_fast(expired)
+
+    assert AuthUtils.is_token_expired_fast("garbage")
+    assert AuthUtils.is_token_expired_fast("a.!!!.c")
+    print("✓ Fast expiry pre-check handles valid, expired and malformed tokens")
+
+
+def main():
+    """Run all tests."""
+    print("Auth Utils Test")
+    print("=" * 40)
+
+    test_verify_token_uses_cache()
+    test_cache_entry_bounded_by_exp()
+    test_invalid_token_not_cached()
+    test_password_hash_upgraded_on_verify()
+    test_validate_password_strength()
+    test_expiry_check_reuses_payload()
+    test_fast_expiry_check()
+
+    print("\n" + "=" * 40)
+    print("✓ All auth utils tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
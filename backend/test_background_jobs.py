@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Test script for the database-backed manual update job queue
+"""
+
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import asyncio
+import tempfile
+import threading
+from contextlib import contextmanager
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import Base
+from app.models import BackgroundJob
+from app.services import background_tasks
+from app.services.background_tasks import BackgroundTaskService, MANUAL_JOB_HISTORY
+
+
+@contextmanager
+def job_database(max_concurrent_updates=3):
+    """Point the job queue at a fresh SQLite database, as every worker process would share."""
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(directory, 'jobs.db')}",
+            connect_args={"check_same_thread": False}
+        )
+        Base.metadata.create_all(bind=engine, tables=[BackgroundJob.__table__])
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        saved = (background_tasks.SessionLocal, background_tasks.JOB_POLL_SECONDS, background_tasks.settings)
+        background_tasks.SessionLocal = session_factory
+        background_tasks.JOB_POLL_SECONDS = 0.01
+        background_tasks.settings = replace(settings, max_concurrent_updates=max_concurrent_updates)
+        try:
+            yield session_factory
+        finally:
+            background_tasks.SessionLocal, background_tasks.JOB_POLL_SECONDS, background_tasks.settings = saved
+            engine.dispose()
+
+
+def worker(release=None):
+    """Build a service whose manual update optionally blocks until release is set."""
+    service = BackgroundTaskService()
+
+    async def fake_update(city_name=None):
+        if release is not None:
+            release.wait(5)
+        return {"message": "Manual update completed", "city": city_name}
+
+    service.trigger_manual_update = fake_update
+    return service
+
+
+async def wait_for_status(service, job_id, status, timeout=5.0):
+    """Poll a job until it reaches the given status."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        job = service.get_job_status(job_id)
+        if job["status"] == status:
+            return job
+        assert asyncio.get_running_loop().time() < deadline, f"job stuck in {job['status']}"
+        await asyncio.sleep(0.01)
+
+
+def test_status_visible_from_other_worker():
+    """Test that a job queued by one worker can be polled through another."""
+    with job_database():
+        async def run():
+            queued = await worker().enqueue_manual_update("Berlin")
+            assert queued["status"] == "queued"
+
+            other_worker = worker()
+            job = await wait_for_status(other_worker, queued["job_id"], "completed")
+            assert job["result"]["city"] == "Berlin"
+            assert job["started_at"] and job["finished_at"]
+            assert other_worker.get_job_status("unknown") is None
+
+        asyncio.run(run())
+    print("✓ Job status shared across workers")
+
+
+def test_concurrency_cap_across_workers():
+    """Test that MAX_CONCURRENT_UPDATES holds across worker processes."""
+    with job_database(max_concurrent_updates=1):
+        release = threading.Event()
+
+        async def run():
+            first_worker, second_worker = worker(release), worker(release)
+            first = await first_worker.enqueue_manual_update("Paris")
+            await wait_for_status(first_worker, first["job_id"], "running")
+
+            second = await second_worker.enqueue_manual_update("Rome")
+            await asyncio.sleep(0.1)
+            assert second_worker.get_job_status(second["job_id"])["status"] == "queued"
+
+            release.set()
+            await wait_for_status(first_worker, first["job_id"], "completed")
+            await wait_for_status(second_worker, second["job_id"], "completed")
+
+        try:
+            asyncio.run(run())
+        finally:
+            release.set()
+    print("✓ Concurrency cap shared across workers")
+
+
+def test_prune_fails_abandoned_and_trims_history():
+    """Test that stale queued/running jobs are failed and old finished jobs are dropped."""
+    with job_database() as session_factory:
+        now = datetime.now()
+        stale = now - timedelta(seconds=background_tasks.JOB_STALE_SECONDS + 1)
+
+        db = session_factory()
+        try:
+            db.add(BackgroundJob(id="stale-running", status="running", queued_at=stale, heartbeat_at=stale))
+            db.add(BackgroundJob(id="stale-queued", status="queued", queued_at=stale, heartbeat_at=stale))
+            db.add(BackgroundJob(id="live-queued", status="queued", queued_at=now, heartbeat_at=now))
+            for i in range(MANUAL_JOB_HISTORY + 5):
+                queued_at = now - timedelta(hours=2, seconds=i)
+                db.add(BackgroundJob(
+                    id=f"done-{i}", status="completed", queued_at=queued_at, heartbeat_at=queued_at
+                ))
+            db.commit()
+
+            BackgroundTaskService()._prune_jobs(db)
+            db.commit()
+            db.expire_all()
+
+            for job_id in ("stale-running", "stale-queued"):
+                job = db.get(BackgroundJob, job_id)
+                assert job is not None and job.status == "failed"
+                assert "abandoned" in job.result["error"]
+            assert db.get(BackgroundJob, "live-queued").status == "queued"
+
+            # The two newly failed jobs are the newest finished ones; the oldest completed ones go
+            finished = db.query(BackgroundJob).filter(BackgroundJob.status.in_(("completed", "failed"))).count()
+            assert finished == MANUAL_JOB_HISTORY
+            assert db.get(BackgroundJob, "done-0") is not None
+            assert db.get(BackgroundJob, f"done-{MANUAL_JOB_HISTORY + 4}") is None
+        finally:
+            db.close()
+    print("✓ Abandoned jobs failed and history trimmed")
+
+
+def test_abandoned_job_stops_waiting():
+    """Test that a queued job marked abandoned elsewhere gives up its wait for a slot."""
+    with job_database() as session_factory:
+        now = datetime.now()
+        db = session_factory()
+        try:
+            db.add(BackgroundJob(id="gone", status="failed", queued_at=now, heartbeat_at=now))
+            db.commit()
+        finally:
+            db.close()
+
+        assert BackgroundTaskService()._claim_job_slot("gone") is None
+    print("✓ Abandoned job stops waiting")
+
+
+def main():
+    """Run all tests."""
+    print("Background Job Queue Test")
+    print("=" * 40)
+
+    test_status_visible_from_other_worker()
+    test_concurrency_cap_across_workers()
+    test_prune_fails_abandoned_and_trims_history()
+    test_abandoned_job_stops_waiting()
+
+    print("\n" + "=" * 40)
+    print("✓ All background job tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test script for the HTTP response cache middleware
+"""
+
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.testclient import TestClient
+
+from app.http_cache import HTTPCacheMiddleware
+
+
+def build_app():
+    """Build a small app whose handler counts calls and can be made to fail."""
+    app = FastAPI()
+    state = {"calls": 0, "fail": False}
+
+    @app.get("/items")
+    def list_items():
+        state["calls"] += 1
+        if state["fail"]:
+            raise RuntimeError("database unavailable")
+        return {"calls": state["calls"]}
+
+    @app.post("/items")
+    def create_item():
+        return {"created": True}
+
+    @app.post("/login")
+    def login():
+        return {"token": "abc"}
+
+    @app.post("/jobs/recalculate")
+    def recalculate():
+        return {"queued": True}
+
+    @app.get("/uncached")
+    def uncached():
+        state["calls"] += 1
+        return {"calls": state["calls"]}
+
+    app.add_middleware(
+        HTTPCacheMiddleware,
+        policies=[(r"/items", 30)],
+        stale_if_error=60,
+        invalidate_prefixes=("/jobs/recalculate",)
+    )
+    return app, state
+
+
+def test_get_served_from_cache():
+    """Test that repeated GETs hit the cache and carry ETag/Cache-Control."""
+    app, state = build_app()
+    client = TestClient(app)
+
+    first = client.get("/items")
+    second = client.get("/items")
+    assert first.json() == second.json() == {"calls": 1}
+    assert state["calls"] == 1
+    assert first.headers["etag"] == second.headers["etag"]
+    assert second.headers["cache-control"].startswith("max-age=")
+
+    client.get("/uncached")
+    client.get("/uncached")
+    assert state["calls"] == 3
+    print("✓ GET responses cached per policy")
+
+
+def test_etag_revalidation():
+    """Test that a matching If-None-Match returns 304 without a body."""
+    app, _ = build_app()
+    client = TestClient(app)
+
+    etag = client.get("/items").headers["etag"]
+    response = client.get("/items", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    print("✓ Matching ETag answered with 304")
+
+
+def test_write_and_auth_bypass():
+    """Test that writes clear the cache and authenticated requests bypass it."""
+    app, state = build_app()
+    client = TestClient(app)
+
+    client.get("/items")
+    client.post("/items")
+    assert client.get("/items").json() == {"calls": 2}
+
+    client.get("/items", headers={"Authorization": "Bearer token"})
+    assert state["calls"] == 3
+    print("✓ Writes clear the cache and authenticated requests bypass it")
+
+
+def test_unrelated_write_keeps_cache():
+    """Test that writes outside cached collections leave the cache intact."""
+    app, state = build_app()
+    client = TestClient(app)
+
+    client.get("/items")
+    client.post("/login")
+    assert client.get("/items").json() == {"calls": 1}
+    assert state["calls"] == 1
+    print("✓ Writes to uncached paths keep cached responses")
+
+
+def test_invalidating_prefix_write():
+    """Test that writes under an extra invalidating prefix clear the cache."""
+    app, state = build_app()
+    client = TestClient(app)
+
+    client.get("/items")
+    client.post("/jobs/recalculate")
+    assert client.get("/items").json() == {"calls": 2}
+    print("✓ Writes under invalidating prefixes clear the cache")
+
+
+def test_stale_if_error():
+    """Test that an expired entry is served when the endpoint fails."""
+    app, state = build_app()
+    client = TestClient(app, raise_server_exceptions=False)
+
+    client.get("/items")
+
+    # Expire the cached entry and make the handler fail
+    cache = _find_cache(app)
+    for entry in cache._entries.values():
+        entry.expires_at = 0
+    state["fail"] = True
+
+    response = client.get("/items")
+    assert response.status_code == 200
+    assert response.json() == {"calls": 1}
+    print("✓ Stale response served when the endpoint fails")
+
+
+def _find_cache(app):
+    """Walk the built middleware stack to the HTTPCacheMiddleware instance."""
+    layer = app.middleware_stack
+    while not isinstance(layer, HTTPCacheMiddleware):
+        layer = layer.app
+    return layer
+
+
+def main():
+    """Run all tests."""
+    print("HTTP Cache Middleware Test")
+    print("=" * 40)
+
+    test_get_served_from_cache()
+    test_etag_revalidation()
+    test_write_and_auth_bypass()
+    test_unrelated_write_keeps_cache()
+    test_invalidating_prefix_write()
+    test_stale_if_error()
+
+    print("\n" + "=" * 40)
+    print("✓ All HTTP cache tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
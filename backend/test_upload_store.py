@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for the content-addressed upload store and its eviction
+"""
+
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import io
+import tempfile
+import time
+from pathlib import Path
+
+from app.services.upload_store import UploadStore, EVICTION_GRACE_SECONDS, TEMP_PREFIX
+
+# Old enough to fall outside the eviction grace window
+OLD = EVICTION_GRACE_SECONDS + 60
+
+
+def store_file(store, name, size, age_seconds):
+    """Write a stored file of the given size and set its last use age_seconds ago."""
+    path = store.directory / name
+    path.write_bytes(b"x" * size)
+    used_at = time.time() - age_seconds
+    os.utime(path, (used_at, used_at))
+    return path
+
+
+def test_evict_least_recently_used_first():
+    """Test that eviction removes the least recently used files until the store fits."""
+    with tempfile.TemporaryDirectory() as directory:
+        store = UploadStore(directory, max_bytes=250)
+        oldest = store_file(store, "a.tif", 100, OLD + 300)
+        middle = store_file(store, "b.tif", 100, OLD + 200)
+        newest = store_file(store, "c.tif", 100, OLD + 100)
+
+        # Reusing the oldest file makes it the most recently used
+        assert store.reuse(oldest)
+
+        assert store.evict() == 1
+        assert oldest.exists() and newest.exists()
+        assert not middle.exists()
+    print("✓ Least recently used upload evicted first")
+
+
+def test_evict_keeps_recent_files():
+    """Test that files used within the grace window survive even over the cap."""
+    with tempfile.TemporaryDirectory() as directory:
+        store = UploadStore(directory, max_bytes=0)
+        old = store_file(store, "old.shp", 100, OLD)
+        recent = store_file(store, "recent.shp", 100, EVICTION_GRACE_SECONDS - 60)
+
+        assert store.evict() == 1
+        assert not old.exists()
+        assert recent.exists()
+    print("✓ Recently used uploads kept during eviction")
+
+
+def test_evict_removes_abandoned_partial_writes():
+    """Test that stale tmp- files are removed and in-progress ones are left alone."""
+    with tempfile.TemporaryDirectory() as directory:
+        store = UploadStore(directory, max_bytes=10 ** 9)
+        abandoned = store_file(store, f"{TEMP_PREFIX}abandoned", 100, OLD)
+        in_progress = store_file(store, f"{TEMP_PREFIX}in-progress", 100, 0)
+        kept = store_file(store, "kept.tif", 100, OLD)
+
+        assert store.evict() == 1
+        assert not abandoned.exists()
+        assert in_progress.exists() and kept.exists()
+    print("✓ Abandoned partial writes cleaned up")
+
+
+def test_write_evicts_when_due():
+    """Test that writes run an eviction pass once they add enough data."""
+    with tempfile.TemporaryDirectory() as directory:
+        store = UploadStore(directory, max_bytes=1000)
+        stale = store_file(store, "stale.tif", 1000, OLD)
+
+        path = store.path_for("abc", ".tif")
+        store.write(path, io.BytesIO(b"y" * 200))
+
+        assert path.read_bytes() == b"y" * 200
+        assert not stale.exists()
+        assert not any(p.name.startswith(TEMP_PREFIX) for p in Path(directory).iterdir())
+    print("✓ Writes evict when the store outgrows its cap")
+
+
+def main():
+    """Run all tests."""
+    print("Upload Store Test")
+    print("=" * 40)
+
+    test_evict_least_recently_used_first()
+    test_evict_keeps_recent_files()
+    test_evict_removes_abandoned_partial_writes()
+    test_write_evicts_when_due()
+
+    print("\n" + "=" * 40)
+    print("✓ All upload store tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())